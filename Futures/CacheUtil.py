@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import mmap
+import tempfile
+import datetime as dt
+from array import array
+from MypseudoSQL import Table
+
+
+class ColumnCache:
+    def __init__(self, source, options=None):
+        """
+        binary cache of a parsed file, stored in "<source>.cache" next to the source:
+        manifest.json and one file per column, numeric columns are raw arrays to be memory mapped
+
+        :param  source: <str> path of the source file
+        :param options: <dict> load options the cached data depends on, e.g. {"with_header": True}
+        """
+        self.__source = os.path.abspath(source)
+        self.__directory = self.__source + ".cache"
+        self.__manifest = os.path.join(self.__directory, "manifest.json")
+        self.__options = options or {}
+
+    def __key(self):
+        stat = os.stat(self.__source)
+        return {"source": self.__source,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "byteorder": sys.byteorder,
+                "options": self.__options}
+
+    def __read_manifest(self):
+        try:
+            with open(self.__manifest) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_valid(self):
+        """
+        :return: <bool> True if the cache exists and the source is not modified since
+        """
+        manifest = self.__read_manifest()
+        return manifest is not None and manifest["key"] == self.__key()
+
+    def load(self):
+        """
+        :return: ColumnarTable, numeric columns memory mapped, None if the cache is missing or stale
+        """
+        manifest = self.__read_manifest()
+        if manifest is None or manifest["key"] != self.__key():
+            return None
+
+        data = {}
+        for i, column in enumerate(manifest["columns"]):
+            filename = os.path.join(self.__directory, "{}.bin".format(i))
+            if column["kind"] == "array":
+                data[column["name"]] = self.__map(filename, column["typecode"])
+
+            elif column["kind"] == "date":
+                data[column["name"]] = list(map(dt.date.fromordinal, self.__map(filename, "q")))
+
+            else:  # json
+                with open(filename) as f:
+                    data[column["name"]] = json.load(f)
+
+        return Table.from_columns(data, [column["name"] for column in manifest["columns"]])
+
+    @staticmethod
+    def __map(filename, typecode):
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # mmap can not map an empty file
+                return array(typecode)
+            # read only pages are shared by every process mapping the same file
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+    def dump(self, table):
+        """
+        :param table: Table
+        :return: <bool> True if the cache is written, False if a column can not be cached,
+                 OSError if the files can not be written
+        """
+        data = table.to_columns()
+        columns = []
+        files = []
+        for column in table.columns:
+            values = data[column]
+            if isinstance(values, (array, memoryview)):
+                typecode = values.typecode if isinstance(values, array) else values.format
+                columns += [{"name": column, "kind": "array", "typecode": typecode}]
+                files += [values.tobytes()]
+
+            elif values and all(type(value) is dt.date for value in values):
+                columns += [{"name": column, "kind": "date"}]
+                files += [array("q", (value.toordinal() for value in values)).tobytes()]
+
+            else:
+                try:
+                    files += [json.dumps(list(values)).encode()]
+                except TypeError:
+                    return False
+                columns += [{"name": column, "kind": "json"}]
+
+        os.makedirs(self.__directory, exist_ok=True)
+
+        # the manifest is replaced last, a cache being written is never loaded,
+        # another process may write the same cache at the same time
+        try:
+            os.remove(self.__manifest)
+        except FileNotFoundError:
+            pass
+
+        for i, content in enumerate(files):
+            self.__replace(os.path.join(self.__directory, "{}.bin".format(i)), content)
+        manifest = {"key": self.__key(), "columns": columns}
+        self.__replace(self.__manifest, json.dumps(manifest).encode())
+        return True
+
+    def __replace(self, filename, content):
+        """
+        write a temporary file with a unique name, then replace the file with it
+        """
+        descriptor, temp = tempfile.mkstemp(suffix=".tmp", dir=self.__directory)
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(content)
+            os.replace(temp, filename)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
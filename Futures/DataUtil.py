@@ -1,36 +1,209 @@
-from .Util import read_csv
-from .SQLiteUtil import SQLiteUtil
-from MypseudoSQL import Table
+import itertools
+import datetime as dt
+from .Util import iter_csv, chunked, infer_type, converter_of, to_int
+from .SQLiteUtil import SQLiteUtil, SQLitePool
+from .CacheUtil import ColumnCache
+from MypseudoSQL import Table, ColumnarTable
 
 
 class DataUtil:
     def __init__(self):
         self.__table = None
-        self.__sqlite_util = None
 
-    def get_data_from_file(self, filename, with_header):
+    def get_data_from_file(self, filename, with_header, columnar=False, schema=None, cache=False):
+        """
+        :param    filename: <str> path of csv file
+        :param with_header: <bool> True if the first line is the header
+        :param    columnar: <bool> store the data column by column
+        :param      schema: {column: type}, int, float, str, datetime.date or function f(value),
+                            "infer" to infer types from the first rows, None to keep strings
+        :param       cache: <bool> write a binary cache next to the file and memory map it on the next load
+                            instead of parsing, the table is columnar, schema of functions is not cached
+        :return: Table
+        """
+        if cache:
+            column_cache = ColumnCache(filename, {"with_header": bool(with_header),
+                                                  "schema": self.__describe_schema(schema)})
+            self.__table = column_cache.load()
+            if self.__table is not None:
+                return self.__table
+            columnar = True
+
+        columns, chunks = self.__read_chunks(filename, with_header, 10000)
+        self.__table = ColumnarTable(columns) if columnar else Table(columns)
+        converters = None
+        for chunk in chunks:
+            if converters is None:
+                converters = self.__resolve_schema(columns, chunk, schema)
+            self.__insert(self.__table, columns, self.__convert(columns, chunk, converters))
+
+        if cache:
+            try:
+                column_cache.dump(self.__table)
+            except OSError:  # the parsed table is returned without a cache
+                pass
+        return self.__table
+
+    def stream_from_file(self, filename, with_header, chunksize=10000, schema=None):
+        """
+        read a file chunk by chunk, at most one chunk is kept in memory
+
+        :param    filename: <str> path of csv file
+        :param with_header: <bool> True if the first line is the header
+        :param   chunksize: <int> rows per chunk
+        :param      schema: {column: type}, "infer" or None, see get_data_from_file,
+                            converted once for each column of a chunk
+        :return: generator of ColumnarTable
+        """
+        columns, chunks = self.__read_chunks(filename, with_header, chunksize)
+        converters = None
+        for chunk in chunks:
+            if converters is None:
+                converters = self.__resolve_schema(columns, chunk, schema)
+            yield Table.from_columns(dict(zip(columns, self.__convert(columns, chunk, converters))), columns)
+
+    @staticmethod
+    def __read_chunks(filename, with_header, chunksize):
+        rows = iter_csv(filename, with_header=False)
+        first_row = next(rows, [])
         if with_header:  # True, file is with headers
-            raw_data = read_csv(filename, with_header=(not with_header))
-            self.__table = Table(raw_data[0])
-            for row in raw_data[1:]:
-                self.__table.insert(row)
+            columns = first_row
         else:  # False, file is without headers
-            raw_data = read_csv(filename, with_header=with_header)
-            columns = ["col_{}".format(i) for i in range(len(raw_data[0]))]
-            self.__table = Table(columns)
-            for row in raw_data:
-                self.__table.insert(row)
-        return self.__table
+            columns = ["col_{}".format(i) for i in range(len(first_row))]
+            rows = itertools.chain([first_row], rows)
+        return columns, chunked(rows, chunksize)
+
+    @staticmethod
+    def __transpose(columns, rows):
+        if any(len(row) != len(columns) for row in rows):
+            raise TypeError("wrong number of elements")
+        return [list(values) for values in zip(*rows)] or [[] for _ in columns]
 
-    def get_data_from_sqlite(self, database, table_name):
-        self.__sqlite_util = SQLiteUtil(database)
-        columns = self.__sqlite_util.get_columns(table_name)
-        raw_data = self.__sqlite_util.scan("select * from %s" % table_name)
-        self.__table = Table(columns)
-        for row in raw_data:
-            self.__table.insert(row)
+    def get_data_from_sqlite(self, database, table_name, columnar=False, schema=None,
+                             columns=None, where=None, parameters=(), between=None):
+        """
+        :param   database: <str> path of sqlite database
+        :param table_name: <str> table name
+        :param   columnar: <bool> store the data column by column
+        :param     schema: {column: type}, "infer" or None, see get_data_from_file
+        :param    columns: [<str> column, ], None for all columns
+        :param      where: <str> condition with ? for parameters, e.g. "volume > ?"
+        :param parameters: (values, ) of the ? in where
+        :param    between: (<str> column, low, high) inclusive, dates compared as dates, e.g. ("Date", "1998/9/8", None),
+                           see SQLiteUtil.select_query
+        :return: Table
+        """
+        columns, chunks = self.__read_sqlite(database, table_name, 10000, columns, where, parameters, between)
+        self.__table = ColumnarTable(columns) if columnar else Table(columns)
+        converters = None
+        for chunk in chunks:
+            if converters is None:
+                converters = self.__resolve_schema(columns, chunk, schema)
+            self.__insert(self.__table, columns, self.__convert(columns, chunk, converters))
         return self.__table
 
+    def stream_from_sqlite(self, database, table_name, chunksize=10000, schema=None,
+                           columns=None, where=None, parameters=(), between=None):
+        """
+        read a table batch by batch from a cursor, the filters are done by sqlite,
+        at most one chunk is kept in memory
+
+        :param   database: <str> path of sqlite database
+        :param table_name: <str> table name
+        :param  chunksize: <int> rows per chunk
+        :param     schema: {column: type}, "infer" or None, see get_data_from_file
+        :param    columns: [<str> column, ], None for all columns
+        :param      where: <str> condition with ? for parameters, e.g. "volume > ?"
+        :param parameters: (values, ) of the ? in where
+        :param    between: (<str> column, low, high) inclusive, dates compared as dates, e.g. ("Date", "1998/9/8", None),
+                           see SQLiteUtil.select_query
+        :return: generator of ColumnarTable, e.g. for IndicatorPipeline.run
+        """
+        columns, chunks = self.__read_sqlite(database, table_name, chunksize, columns, where, parameters, between)
+        converters = None
+        for chunk in chunks:
+            if converters is None:
+                converters = self.__resolve_schema(columns, chunk, schema)
+            yield Table.from_columns(dict(zip(columns, self.__convert(columns, chunk, converters))), columns)
+
+    @staticmethod
+    def __read_sqlite(database, table_name, chunksize, columns, where, parameters, between):
+        # connections are reused from the shared pool of the database
+        pool = SQLitePool.of(database)
+        if not columns:
+            with pool.reader() as connection:
+                columns = SQLiteUtil(database, connection).get_columns(table_name)
+        columns = list(columns)
+        query, parameters = SQLiteUtil.select_query(table_name, columns, where, parameters, between)
+
+        def chunks():
+            with pool.reader() as connection:
+                for rows in SQLiteUtil(database, connection).iter_scan(query, parameters, chunksize):
+                    yield rows
+        return columns, chunks()
+
+    @staticmethod
+    def __insert(table, columns, values):
+        if isinstance(table, ColumnarTable):  # column by column, without a dict per row
+            table.extend(dict(zip(columns, values)))
+        else:
+            for row in zip(*values):
+                table.insert(row)
+
+    @staticmethod
+    def __describe_schema(schema):
+        """
+        :return: schema as the key of a cache, only types are cached,
+                 a function can not be identified by its name, e.g. <lambda>
+        """
+        if isinstance(schema, dict):
+            cached_types = {int: "int", float: "float", str: "str", dt.date: "date"}
+            for column, column_type in schema.items():
+                if column_type not in cached_types:
+                    raise Exception("{} of {} can not be cached, cache=False for a function".format(
+                        getattr(column_type, "__name__", repr(column_type)), column))
+            return {column: cached_types[column_type] for column, column_type in schema.items()}
+        return schema
+
+    @staticmethod
+    def __resolve_schema(columns, rows, schema):
+        """
+        :return: {column: (function, inferred)}
+        """
+        if schema is None:
+            return {}
+
+        if schema == "infer":
+            sample = rows[:1000]
+            column_types = [infer_type(values) for values in DataUtil.__transpose(columns, sample)]
+            return {column: (to_int if column_type is int else converter_of(column_type), True)
+                    for column, column_type in zip(columns, column_types)}
+
+        return {column: (converter_of(column_type), False) for column, column_type in schema.items()}
+
+    @staticmethod
+    def __convert(columns, rows, converters):
+        """
+        convert rows column by column
+
+        :param converters: {column: (function, inferred)}, inferred converters may be widened
+        :return: [[values of column], ]
+        """
+        values = DataUtil.__transpose(columns, rows)
+        for i, column in enumerate(columns):
+            if column not in converters:
+                continue
+            converter, inferred = converters[column]
+            try:
+                values[i] = list(map(converter, values[i]))
+            except ValueError:
+                if not (inferred and converter is to_int):
+                    raise
+                # inferred int from the sample, e.g. 140992.9 later in Volume
+                converters[column] = (float, True)
+                values[i] = list(map(float, values[i]))
+        return values
+
     def get_data_from_url(self, url=None):
         pass
 
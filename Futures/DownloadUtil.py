@@ -0,0 +1,147 @@
+import os
+import re
+import csv
+import time
+import hashlib
+import datetime as dt
+import urllib.error
+import urllib.request
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from MypseudoSQL import Table
+
+
+class PriceVolumeDownloader:
+    base_uri = "https://www.twse.com.tw/exchangeReport/FMTQIK?response=csv&date={year}{month}01"
+
+    def __init__(self, cache_dir, base_uri=None, max_workers=4, retries=3, backoff=1.0, timeout=30.0,
+                 proxies=None, encoding="cp950"):
+        """
+        monthly price and volume of TWSE (FMTQIK), months are downloaded concurrently
+        and the response of every completed month is cached on disk by its url
+
+        :param   cache_dir: <str> directory of cached responses
+        :param    base_uri: <str> url with {year} and {month}, default to FMTQIK of TWSE
+        :param max_workers: <int> number of concurrent downloads
+        :param     retries: <int> retries of a failed download
+        :param     backoff: <float> seconds before the first retry, doubled for each retry
+        :param     timeout: <float> seconds of a request
+        :param     proxies: {scheme: "host:port"}, e.g. {"https": "172.18.212.222:3128"}
+        :param    encoding: <str> encoding of the response
+        """
+        self.__cache_dir = cache_dir
+        self.__base_uri = base_uri or self.base_uri
+        self.__max_workers = max_workers
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__timeout = timeout
+        self.__encoding = encoding
+        handlers = [urllib.request.ProxyHandler(proxies)] if proxies else []
+        self.__opener = urllib.request.build_opener(*handlers)
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def __cache_file(self, url):
+        return os.path.join(self.__cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".csv")
+
+    def fetch(self, url):
+        """
+        :param url: <str> url
+        :return: <bytes> response, retried with backoff on connection errors, timeouts, 429 and 5xx
+        """
+        for attempt in range(self.__retries + 1):
+            try:
+                with self.__opener.open(url, timeout=self.__timeout) as response:
+                    return response.read()
+            except urllib.error.HTTPError as e:
+                if e.code != 429 and e.code < 500 or attempt == self.__retries:
+                    raise
+            except (urllib.error.URLError, OSError):
+                if attempt == self.__retries:
+                    raise
+            time.sleep(self.__backoff * 2 ** attempt)
+
+    def get(self, year, month):
+        """
+        :param  year: <int> year, e.g. 2018
+        :param month: <int> month, 1 to 12
+        :return: <str> csv of the month, from the cache if it is downloaded before
+        """
+        return self.__get(year, month)[0]
+
+    def __get(self, year, month):
+        """
+        :return: (<str> csv of the month, ColumnarTable of it)
+        """
+        url = self.__base_uri.format(year=year, month="%02d" % month)
+        filename = self.__cache_file(url)
+        if os.path.exists(filename):
+            with open(filename, "rb") as f:
+                text = f.read().decode(self.__encoding)
+            return text, self.map_to_table(text)
+
+        content = self.fetch(url)
+        # parsed before it is cached, e.g. a throttling page is downloaded again next time
+        text = content.decode(self.__encoding)
+        table = self.map_to_table(text)
+
+        # the current month is not completed, it is downloaded again next time
+        today = dt.date.today()
+        if (year, month) < (today.year, today.month):
+            temp = filename + ".tmp"
+            with open(temp, "wb") as f:
+                f.write(content)
+            os.replace(temp, filename)
+        return text, table
+
+    @staticmethod
+    def __to_date(value):
+        """
+        :param value: <str> date in ROC year, e.g. "107/01/02"
+        :return: <datetime.date>
+        """
+        year, month, day = map(int, value.split("/"))
+        return dt.date(year + 1911 if year < 1911 else year, month, day)
+
+    def map_to_table(self, text):
+        """
+        :param text: <str> csv of a month
+        :return: ColumnarTable of 日期 as <datetime.date> and the other columns as <float>
+        """
+        header = None
+        rows = []
+        for row in csv.reader(text.splitlines()):
+            row = [value.strip() for value in row]
+            if header is None and row and row[0] == "日期":
+                header = [column for column in row if column]
+            elif header is not None and row and re.match(r"^\d+/\d+/\d+$", row[0]):
+                rows.append(row[:len(header)])
+
+        if header is None:
+            raise Exception("no data in the response")
+
+        data = {header[0]: [self.__to_date(row[0]) for row in rows]}
+        for i, column in enumerate(header[1:], 1):
+            data[column] = array("d", (float(row[i].replace(",", "")) for row in rows))
+        return Table.from_columns(data, header)
+
+    def download(self, months):
+        """
+        :param months: [(<int> year, <int> month), ]
+        :return: ColumnarTable of all months in the given order
+        """
+        months = list(months)
+        with ThreadPoolExecutor(self.__max_workers) as executor:
+            tables = list(executor.map(lambda month: self.__get(*month)[1], months))
+
+        if not tables:
+            raise Exception("no month to download")
+        columns = tables[0].columns
+        data = {column: [] if column == columns[0] else array("d") for column in columns}
+        for table in tables:
+            if table.columns != columns:
+                raise Exception("columns of months are different")
+            for column, values in table.to_columns().items():
+                data[column].extend(values)
+        return Table.from_columns(data, columns)
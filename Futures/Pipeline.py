@@ -0,0 +1,134 @@
+import time as timer
+import itertools
+from operator import itemgetter
+from collections import OrderedDict
+from .Util import time_to_num
+from MypseudoSQL import Table
+
+
+class IndicatorPipeline:
+    def __init__(self, time_field="time", parse_time=True):
+        """
+        one tick stream fanned out to many indicators,
+        the time of a tick is parsed and its order is checked once for all indicators
+
+        :param time_field: <str> field of the tick time, e.g. "time"
+        :param parse_time: <bool> parse HHMMSSss into <int> by time_to_num,
+                           registered indicators are then switched to numeric_time=True
+        """
+        self.__time_field = time_field
+        self.__parse_time = parse_time
+        self.__indicators = OrderedDict()
+        self.__last_timestamp = None
+        self.__getters = None
+        self.__results = OrderedDict([(time_field, [])])
+        self.__timings = OrderedDict()
+
+    def register(self, name, indicator, fields, get_args=(), outputs=None):
+        """
+        :param      name: <str> name of the indicator, prefix of its result columns
+        :param indicator: indicator, e.g. OpenHighLowClose(time_to_num("08450000"), 6000),
+                          its order of times is checked by the pipeline instead, see assume_ordered
+        :param    fields: [<str> field, ] tick fields given to update after the time, in order,
+                          or a function f({field: value}) for a computed argument
+        :param  get_args: (args, ) given to get, e.g. ("price", ) for MovingAverage
+        :param   outputs: [<str>, ] names of values returned by get after the time, default to 0, 1, ...
+        :return: self
+        """
+        if name in self.__indicators:
+            raise Exception("indicator {} is registered".format(name))
+
+        indicator.assume_ordered(True if self.__parse_time else None)
+        self.__indicators[name] = {"indicator": indicator,
+                                   "fields": list(fields),
+                                   "get_args": tuple(get_args),
+                                   "outputs": None if outputs is None else list(outputs)}
+        self.__timings[name] = 0.0
+        self.__getters = None
+        return self
+
+    @property
+    def timings(self):
+        """
+        :return: {name: <float> seconds spent in update and get}
+        """
+        return dict(self.__timings)
+
+    def __build_getters(self, columns=None):
+        """
+        :param columns: ["column", ] if ticks are tuples of these columns, None if ticks are {field: value}
+        """
+        def getter(field):
+            if columns is None:
+                return field if callable(field) else itemgetter(field)
+            if callable(field):
+                return lambda tick: field(dict(zip(columns, tick)))
+            return itemgetter(columns.index(field))
+
+        self.__getters = (getter(self.__time_field),
+                          [(name, registration, [getter(field) for field in registration["fields"]])
+                           for name, registration in self.__indicators.items()])
+
+    def __process(self, tick):
+        time_getter, indicators = self.__getters
+        time = time_getter(tick)
+        timestamp = time_to_num(time) if self.__parse_time else time
+
+        if self.__last_timestamp is not None and timestamp < self.__last_timestamp:
+            raise Exception("timestamp is out of order")
+        self.__last_timestamp = timestamp
+
+        self.__results[self.__time_field].append(time)
+        for name, registration, getters in indicators:
+            indicator = registration["indicator"]
+            start = timer.perf_counter()
+            indicator.update(timestamp, *[get(tick) for get in getters])
+            values = indicator.get(*registration["get_args"])
+            self.__timings[name] += timer.perf_counter() - start
+
+            if registration["outputs"] is None:
+                registration["outputs"] = [str(i) for i in range(len(values) - 1)]
+            for output, value in zip(registration["outputs"], values[1:]):
+                self.__results.setdefault("{}_{}".format(name, output), []).append(value)
+
+    def update(self, tick):
+        """
+        :param tick: {field: value}
+        :return: void
+        """
+        if self.__getters is None:
+            self.__build_getters()
+        self.__process(tick)
+
+    def run(self, source):
+        """
+        :param source: Table, iterable of Tables with the same columns, e.g. DataUtil.stream_from_sqlite,
+                       or iterable of {field: value}
+        :return: ColumnarTable, see result
+        """
+        if isinstance(source, Table):
+            source = [source]
+        source = iter(source)
+        first = next(source, None)
+        if first is None:
+            return self.result()
+
+        if isinstance(first, Table):
+            self.__build_getters(first.columns)
+            for table in itertools.chain([first], source):
+                columns = table.to_columns()
+                for tick in zip(*[columns[column] for column in table.columns]):
+                    self.__process(tick)
+        else:
+            self.__build_getters()
+            for tick in itertools.chain([first], source):
+                self.__process(tick)
+        self.__getters = None
+        return self.result()
+
+    def result(self):
+        """
+        :return: ColumnarTable of the time and get() outputs of every indicator after each tick,
+                 columns named <name>_<output>
+        """
+        return Table.from_columns(self.__results)
@@ -0,0 +1,120 @@
+from .Util import time_to_num, num_to_time
+from .SQLiteUtil import SQLitePool, SQLiteUtil
+
+
+class MinuteRollup:
+    __columns = ["date", "time", "open", "high", "low", "close", "volume", "buy_volume", "sell_volume", "count"]
+
+    def __init__(self, database, conf=None, source=None, target=None,
+                 columns=("date", "time", "price", "volume"), period=6000, batch_size=10000):
+        """
+        bars of tick_log per period in tick_log_minute, updated with the ticks inserted since the last update
+
+        time                   : start of the period, format: HHMMSSss
+        open, high, low, close : prices of the period, see OpenHighLowClose
+        volume                 : total volume of the period
+        buy_volume, sell_volume: volume of ticks with price above / below the previous tick of the date,
+                                 see SimpleSellBuyVolume
+        count                  : number of ticks
+
+        :param   database: <str> path of sqlite database
+        :param       conf: Config with TICK_LOG_TABLE and TICK_LOG_PER_MINUTE_TABLE, e.g. conf/conf.properties
+        :param     source: <str> tick table, default to TICK_LOG_TABLE or tick_log
+        :param     target: <str> bar table, default to TICK_LOG_PER_MINUTE_TABLE or tick_log_minute
+        :param    columns: (date, time, price, volume) columns of the tick table, ticks are inserted in time order
+        :param     period: <int> period of a bar, 6000 for 1 minute, see time_to_num
+        :param batch_size: <int> ticks fetched at once
+        """
+        def option(name, default):
+            return conf.prop.get("DEFAULT", name, fallback=default) if conf is not None else default
+
+        self.__source = source or option("TICK_LOG_TABLE", "tick_log")
+        self.__target = target or option("TICK_LOG_PER_MINUTE_TABLE", "tick_log_minute")
+        self.__tick_columns = list(columns)
+        self.__period = period
+        self.__batch_size = batch_size
+        self.__pool = SQLitePool.of(database)
+
+    def __create_tables(self, connection):
+        connection.execute("create table if not exists {} (date text, time text, open real, high real, low real, "
+                           "close real, volume real, buy_volume real, sell_volume real, count integer, "
+                           "primary key (date, time))".format(self.__target))
+        connection.execute("create table if not exists rollup_watermark "
+                           "(target text primary key, last_rowid integer, date text, time text)")
+
+    def __watermark(self, connection):
+        """
+        :return: (<int> rowid of the latest tick rolled up, [latest bar] or None)
+        """
+        watermark = connection.execute("select last_rowid, date, time from rollup_watermark where target = ?",
+                                       (self.__target,)).fetchone()
+        if watermark is None:
+            return 0, None
+        bar = connection.execute("select {} from {} where date = ? and time = ?".format(
+            ",".join(self.__columns), self.__target), watermark[1:]).fetchone()
+        return watermark[0], None if bar is None else list(bar)
+
+    def update(self):
+        """
+        roll up the ticks inserted since the last update, the latest bar is merged with its new ticks,
+        bars and the watermark are written in one transaction
+
+        :return: <int> number of bars written
+        """
+        insert_query = "insert or replace into {} values ({})".format(self.__target,
+                                                                     ",".join("?" for _ in self.__columns))
+        with self.__pool.writer() as connection:
+            self.__create_tables(connection)
+            watermark, bar = self.__watermark(connection)
+            query, parameters = SQLiteUtil.select_query(self.__source, ["rowid"] + self.__tick_columns,
+                                                        "rowid > ?", (watermark,))
+
+            period = self.__period
+            last_rowid = watermark
+            bar_start = last_timestamp = None if bar is None else time_to_num(bar[1])
+            written = 0
+            for rows in SQLiteUtil(None, connection).iter_scan(query + " order by rowid", parameters,
+                                                                self.__batch_size):
+                bars = []
+                for rowid, date, time, price, volume in rows:
+                    # columns of tick_log may be text, the date is compared as the text stored in the bars
+                    date, price, volume = str(date), float(price), float(volume)
+                    timestamp = time_to_num(time)
+                    start = timestamp // period * period
+                    last_rowid = rowid
+                    if bar is not None and date == bar[0]:
+                        if timestamp < last_timestamp:
+                            raise Exception("timestamp is out of order")
+                        last_timestamp = timestamp
+                        if start == bar_start:
+                            bar[3] = max(bar[3], price)
+                            bar[4] = min(bar[4], price)
+                            if price > bar[5]:
+                                bar[7] += volume
+                            elif price < bar[5]:
+                                bar[8] += volume
+                            bar[5] = price
+                            bar[6] += volume
+                            bar[9] += 1
+                            continue
+                        last_price = bar[5]
+                    else:  # the first tick of a date is neither buy nor sell
+                        last_price = price
+                        last_timestamp = timestamp
+
+                    if bar is not None:
+                        bars.append(bar)
+                    bar = [date, num_to_time(start), price, price, price, price, volume,
+                           volume if price > last_price else 0, volume if price < last_price else 0, 1]
+                    bar_start = start
+
+                # completed bars are written batch by batch, the latest one may get more ticks
+                connection.executemany(insert_query, bars)
+                written += len(bars)
+
+            if last_rowid == watermark:
+                return 0
+            connection.execute(insert_query, bar)
+            connection.execute("insert or replace into rollup_watermark values (?, ?, ?, ?)",
+                               (self.__target, last_rowid, bar[0], bar[1]))
+            return written + 1
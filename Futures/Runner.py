@@ -0,0 +1,78 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from MypseudoSQL import Table, ColumnarTable
+
+
+def _compact(table):
+    """
+    :return: {column: array or list}, typed columns as arrays to be pickled as raw bytes
+    """
+    data = {}
+    for column, values in Table.from_columns(table.to_columns(), table.columns).to_columns().items():
+        data[column] = array(values.format, values) if isinstance(values, memoryview) else values
+    return data
+
+
+def _run_partition(task, columns, data):
+    """
+    executed in a worker process
+
+    :return: (["column", ], {column: array or list}), None if task returns None
+    """
+    result = task(Table.from_columns(data, columns))
+    if result is None:
+        return None
+    return result.columns, _compact(result)
+
+
+class PartitionRunner:
+    def __init__(self, task, partition_by, max_workers=None):
+        """
+        run a task on independent partitions of a table in a process pool, e.g. one per contract or trading day
+
+        :param         task: function f(ColumnarTable) -> Table or None, defined at module level to be pickled
+        :param partition_by: ["column", ], or function f({key: value}) giving the key of a row
+        :param  max_workers: <int> number of processes, None for the number of cores, 1 to run in this process
+        """
+        self.__task = task
+        self.__partition_by = partition_by
+        self.__max_workers = max_workers
+
+    def run(self, table):
+        """
+        :param table: Table
+        :return: ColumnarTable, results of every partition in order of partitions,
+                 with the partition columns prepended if the results do not have them
+        """
+        partitions = table.partition(self.__partition_by)
+        jobs = [(key, part.columns, _compact(part)) for key, part in partitions.items()]
+
+        if self.__max_workers == 1:
+            results = [_run_partition(self.__task, columns, data) for _, columns, data in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+                futures = [executor.submit(_run_partition, self.__task, columns, data) for _, columns, data in jobs]
+                results = [future.result() for future in futures]
+
+        return self.__merge([key for key, _, _ in jobs], results)
+
+    def __merge(self, keys, results):
+        key_columns = [] if callable(self.__partition_by) else list(self.__partition_by)
+        merged = None
+        for key, result in zip(keys, results):
+            if result is None:
+                continue
+
+            columns, data = result
+            length = len(data[columns[0]]) if columns else 0
+            prepended = [column for column in key_columns if column not in columns]
+            for column in prepended:
+                data[column] = [key[key_columns.index(column)]] * length
+
+            if merged is None:
+                merged = ColumnarTable(prepended + columns)
+            elif set(merged.columns) != set(prepended + columns):
+                raise Exception("partitions with different result columns: {}".format(key))
+            merged.extend(data)
+
+        return merged if merged is not None else ColumnarTable(key_columns)
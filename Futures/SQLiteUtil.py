@@ -1,44 +1,168 @@
 import os
+import re
+import csv
+import atexit
+import asyncio
 import sqlite3
-from .Util import read_csv
+import threading
+import datetime as dt
+from contextlib import contextmanager
+from .Util import iter_csv, chunked, to_date
+
+_DATE_PATTERN = re.compile(r"^\d{4}[/-]\d{1,2}[/-]\d{1,2}$")
+
+
+def _is_date(value):
+    return isinstance(value, dt.date) or isinstance(value, str) and _DATE_PATTERN.match(value) is not None
+
+
+def _iso_date(value):
+    """
+    sqlite function iso_date(value): date of YYYY/M/D or YYYY-MM-DD as YYYY-MM-DD, NULL if it is not a date
+    """
+    if not isinstance(value, str) or _DATE_PATTERN.match(value) is None:
+        return None
+    try:
+        return to_date(value).isoformat()
+    except ValueError:
+        return None
+
+
+def _connect(database, **kwargs):
+    """
+    :return: sqlite3.Connection with the functions used by the queries of SQLiteUtil, e.g. iso_date
+    """
+    connection = sqlite3.connect(database, **kwargs)
+    connection.create_function("iso_date", 1, _iso_date, deterministic=True)
+    return connection
 
 
 class SQLite:
-    def __init__(self, database):
-        self.conn = None
+    def __init__(self, database, connection=None):
+        """
+        :param   database: <str> path of sqlite database
+        :param connection: sqlite3.Connection to use instead of a new one, e.g. from SQLitePool,
+                           it is not closed by close
+        """
+        self.conn = connection
         self.__database = database
-        self.__get_connection()
+        self.__owned = connection is None
+        if self.__owned:
+            self.__get_connection()
 
     def __get_connection(self):
-        self.conn = sqlite3.connect(self.__database)
+        self.conn = _connect(self.__database)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    def create_table(self, sqlite_table_name, sqlite_columns):
+    def create_table(self, sqlite_table_name, sqlite_columns, schema=None):
+        """
+        :param sqlite_table_name: <str> table name
+        :param    sqlite_columns: [<str> column, ]
+        :param            schema: {column: int, float, str or "integer", "real", "text"}, text if not given
+        :return: void
+        """
         create_template = "create table if not exists {table} ({column})"
-        columns = ",".join("{} text".format(col) for col in sqlite_columns)
+        schema = schema or {}
+        columns = ",".join("{} {}".format(col, self.__column_type(schema.get(col, str))) for col in sqlite_columns)
         create_query = create_template.format(table=sqlite_table_name, column=columns)
         self.conn.execute(create_query)
         self.conn.commit()
 
-    def write_sqlite(self, path_str, table_name):
+    @staticmethod
+    def __column_type(column_type):
+        if isinstance(column_type, str):
+            if column_type.lower() not in ("integer", "real", "text", "numeric", "blob"):
+                raise Exception("unknown sqlite type: {}".format(column_type))
+            return column_type.lower()
+        return {int: "integer", float: "real"}.get(column_type, "text")
+
+    def create_index(self, table_name, columns, unique=False):
+        """
+        :param table_name: <str> table name
+        :param    columns: <str> column or [<str> column, ]
+        :param     unique: <bool> unique index
+        :return: void
+        """
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        self.conn.execute("create {unique}index if not exists {name} on {table} ({columns})".format(
+            unique="unique " if unique else "",
+            name="_".join([table_name] + columns + ["index"]),
+            table=table_name,
+            columns=",".join(columns)))
+        self.conn.commit()
+
+    def __set_pragmas(self, pragmas):
+        """
+        :return: {pragma: value before}
+        """
+        before = {}
+        for pragma, value in pragmas.items():
+            before[pragma] = self.conn.execute("pragma {}".format(pragma)).fetchone()[0]
+            self.conn.execute("pragma {} = {}".format(pragma, value))
+        return before
+
+    def write_sqlite(self, path_str, table_name, schema=None, batch_size=50000, indexes=()):
+        """
+        stream csv files into a table in batches of bounded size, in one transaction,
+        with journal and synchronous pragmas for bulk load, indexes are built after the rows are loaded,
+        a database in WAL mode stays in it
+
+        :param   path_str: <str> csv file, or directory of csv files with the same header
+        :param table_name: <str> table name, created from the header and schema if not exists
+        :param     schema: {column: type}, see create_table, values are stored by the column affinity
+        :param batch_size: <int> rows per executemany
+        :param    indexes: [<str> column or [<str> column, ], ] indexes to create after load
+        :return: <int> number of rows inserted
+        """
         insert_template = "insert into {table} values ({column})"
         if os.path.isdir(path_str):
-            data = []
-            for filename in os.listdir(path_str):
-                data.extend(read_csv(os.path.join(path_str, filename)))
+            filenames = [os.path.join(path_str, filename) for filename in sorted(os.listdir(path_str))]
         else:
-            filename = path_str
-            data = read_csv(filename, with_header=True)
-        columns = ",".join("?" for _ in range(len(data[0])))
+            filenames = [path_str]
+
+        if table_name not in self.tables():
+            with open(filenames[0]) as f:
+                self.create_table(table_name, next(csv.reader(f)), schema)
+
+        columns = ",".join("?" for _ in range(len(self.get_columns(table_name))))
         insert_query = insert_template.format(table=table_name, column=columns)
-        self.conn.executemany(insert_query, data)
-        self.conn.commit()
+
+        # a failed load is rolled back, no journal file is needed to recover it
+        pragmas = {"journal_mode": "memory", "synchronous": "off", "temp_store": "memory", "cache_size": -65536}
+        # a database in WAL mode, e.g. opened by SQLitePool, can not leave it while the pool is connected
+        if self.conn.execute("pragma journal_mode").fetchone()[0] == "wal":
+            del pragmas["journal_mode"]
+        before = self.__set_pragmas(pragmas)
+        count = 0
+        try:
+            self.conn.execute("begin")
+            for filename in filenames:
+                for rows in chunked(iter_csv(filename, with_header=True), batch_size):
+                    self.conn.executemany(insert_query, rows)
+                    count += len(rows)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self.__set_pragmas(before)
+
+        for index in indexes:
+            self.create_index(table_name, index)
+        return count
 
     def drop_table(self, table_name):
         self.conn.execute("drop table if exists %s" % table_name)
         self.conn.commit()
 
     def close(self):
-        self.conn.close()
+        if self.__owned:
+            self.conn.close()
 
     def tables(self):
         cursor = self.conn.execute("select name from sqlite_master where type='table'")
@@ -59,6 +183,220 @@ class SQLite:
 
 
 class SQLiteUtil(SQLite):
-    def scan(self, query):
-        cursor = self.conn.execute(query)
+    def scan(self, query, parameters=()):
+        cursor = self.conn.execute(query, parameters)
         return cursor.fetchall()
+
+    def iter_scan(self, query, parameters=(), batch_size=10000):
+        """
+        :param      query: <str> select query
+        :param parameters: (values, ) of the ? in the query
+        :param batch_size: <int> rows fetched at once
+        :return: generator of [row, ] with at most batch_size rows, the cursor is read batch by batch
+        """
+        cursor = self.conn.execute(query, parameters)
+        try:
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def select_query(table_name, columns=None, where=None, parameters=(), between=None):
+        """
+        :param table_name: <str> table name
+        :param    columns: [<str> column, ], None for all columns
+        :param      where: <str> condition with ? for parameters, e.g. "volume > ?"
+        :param parameters: (values, ) of the ? in where
+        :param    between: (<str> column, low, high), low or high None for no bound, e.g. ("volume", 1000, None),
+                           a bound of datetime.date or YYYY/M/D text compares the column as dates,
+                           e.g. ("Date", "1998/9/8", dt.date(1998, 12, 31)) with dates stored as "1998/10/1"
+        :return: (<str> query, (values, )), the query of dates needs a connection of SQLite or SQLitePool
+        """
+        conditions = ["({})".format(where)] if where else []
+        parameters = list(parameters)
+        if between is not None:
+            column, low, high = between
+            # text of dates is not in order, e.g. "1998/10/1" < "1998/9/8", both sides are compared as YYYY-MM-DD
+            if any(_is_date(bound) for bound in (low, high)):
+                column = "iso_date({})".format(column)
+                low, high = (None if bound is None else to_date(bound).isoformat() for bound in (low, high))
+            for operator, bound in ((">=", low), ("<=", high)):
+                if bound is not None:
+                    conditions.append("{} {} ?".format(column, operator))
+                    parameters.append(bound)
+
+        query = "select {} from {}".format(",".join(columns) if columns else "*", table_name)
+        if conditions:
+            query += " where " + " and ".join(conditions)
+        return query, tuple(parameters)
+
+
+class SQLitePool:
+    # shared pools by path of database, closed at exit
+    __pools = {}
+    __pools_lock = threading.Lock()
+
+    def __init__(self, database, max_readers=4, timeout=30.0):
+        """
+        connections of one database reused across calls and threads:
+        up to max_readers read connections and one write connection, the database is in WAL mode
+        so reads are not blocked by the writer
+
+        :param    database: <str> path of sqlite database
+        :param max_readers: <int> number of read connections
+        :param     timeout: <float> seconds to wait for a connection or a lock, None to wait forever
+        """
+        self.__database = database
+        self.__max_readers = max_readers
+        self.__timeout = timeout
+        self.__idle = []
+        self.__opened = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__writer_lock = threading.Lock()
+        self.__writer = self.__connect()
+        self.__writer.execute("pragma journal_mode = wal")
+        self.__writer.execute("pragma synchronous = normal")
+
+    @classmethod
+    def of(cls, database):
+        """
+        :param database: <str> path of sqlite database
+        :return: SQLitePool shared by every caller of the database
+        """
+        key = os.path.abspath(database)
+        with cls.__pools_lock:
+            pool = cls.__pools.get(key)
+            if pool is None or pool.closed:
+                pool = cls.__pools[key] = cls(database)
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        with cls.__pools_lock:
+            for pool in cls.__pools.values():
+                pool.close()
+            cls.__pools.clear()
+
+    @property
+    def closed(self):
+        return self.__closed
+
+    def __connect(self):
+        connection = _connect(self.__database, check_same_thread=False)
+        # waiting for the lock of the writer, in milliseconds
+        timeout = 0 if self.__timeout is None else int(self.__timeout * 1000)
+        connection.execute("pragma busy_timeout = {}".format(timeout))
+        return connection
+
+    def __checkout(self):
+        with self.__condition:
+            while not self.__closed and not self.__idle and self.__opened >= self.__max_readers:
+                if not self.__condition.wait(self.__timeout):
+                    raise Exception("no sqlite connection is available in {} seconds".format(self.__timeout))
+            if self.__closed:
+                raise Exception("sqlite pool is closed")
+            if self.__idle:
+                return self.__idle.pop()
+            self.__opened += 1
+
+        try:
+            connection = self.__connect()
+            connection.execute("pragma query_only = 1")
+            return connection
+        except BaseException:
+            with self.__condition:
+                self.__opened -= 1
+                self.__condition.notify()
+            raise
+
+    def __checkin(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        with self.__condition:
+            if self.__closed:
+                connection.close()
+                self.__opened -= 1
+            else:
+                self.__idle.append(connection)
+            self.__condition.notify()
+
+    @contextmanager
+    def reader(self):
+        """
+        with pool.reader() as connection: ...
+
+        :return: read only sqlite3.Connection, returned to the pool at the end of the block
+        """
+        connection = self.__checkout()
+        try:
+            yield connection
+        finally:
+            self.__checkin(connection)
+
+    @contextmanager
+    def writer(self):
+        """
+        with pool.writer() as connection: ...
+
+        :return: the write sqlite3.Connection, committed at the end of the block or rolled back on error,
+                 one thread writes at a time
+        """
+        if not self.__writer_lock.acquire(timeout=-1 if self.__timeout is None else self.__timeout):
+            raise Exception("sqlite writer is not available in {} seconds".format(self.__timeout))
+        try:
+            if self.__closed:
+                raise Exception("sqlite pool is closed")
+            try:
+                yield self.__writer
+                self.__writer.commit()
+            except BaseException:
+                self.__writer.rollback()
+                raise
+        finally:
+            self.__writer_lock.release()
+
+    def scan(self, query, parameters=()):
+        """
+        :return: [row, ] of the query from a read connection
+        """
+        with self.reader() as connection:
+            return connection.execute(query, parameters).fetchall()
+
+    async def scan_async(self, query, parameters=(), executor=None):
+        """
+        scan in an executor, the event loop is not blocked
+
+        :param executor: concurrent.futures.Executor, None for the default executor of the loop
+        :return: [row, ] of the query
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.scan, query, parameters)
+
+    def close(self):
+        """
+        close idle connections and the writer, connections checked out are closed when returned
+        """
+        with self.__condition:
+            if self.__closed:
+                return
+            self.__closed = True
+            for connection in self.__idle:
+                connection.close()
+            self.__opened -= len(self.__idle)
+            self.__idle = []
+            self.__condition.notify_all()
+        with self.__writer_lock:
+            self.__writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+atexit.register(SQLitePool.close_all)
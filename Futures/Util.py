@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
 import warnings
 import functools
+import bisect
 import csv
+import array
+import itertools
+import collections
 import abc
+import sys
 import datetime as dt
 from abc import ABC
 
+# sum of floats is compensated since python 3.12, a sum can not be extended by adding one more value
+_COMPENSATED_SUM = sys.version_info >= (3, 12)
+
 
 def deprecated(func):
     """This is a decorator which can be used to mark functions
@@ -22,7 +30,16 @@ def deprecated(func):
     return new_func
 
 
-def read_csv(filename, with_header=True):
+def read_csv(filename, with_header=True, chunksize=None):
+    """
+    :param    filename: <str> path of csv file
+    :param with_header: <bool> skip the first line if True
+    :param   chunksize: <int> rows per chunk, None for the whole file
+    :return: [row, ] if chunksize is None else generator of [row, ] with at most chunksize rows
+    """
+    if chunksize:
+        return chunked(iter_csv(filename, with_header), chunksize)
+
     with open(filename) as f:
         csv_reader = csv.reader(f)
         if with_header:
@@ -31,19 +48,94 @@ def read_csv(filename, with_header=True):
     return data
 
 
+def iter_csv(filename, with_header=True):
+    """
+    :param    filename: <str> path of csv file
+    :param with_header: <bool> skip the first line if True
+    :return: generator of row, the file is read line by line
+    """
+    with open(filename) as f:
+        csv_reader = csv.reader(f)
+        if with_header:
+            next(csv_reader, None)
+        for row in csv_reader:
+            yield row
+
+
+def chunked(iterable, size):
+    """
+    :param iterable: iterable
+    :param     size: <int> items per chunk
+    :return: generator of [item, ] with at most size items
+    """
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def to_date(value):
+    """
+    :param value: <str> date, format: YYYY/MM/DD or YYYY-MM-DD, e.g. "1998/9/8"
+    :return: <datetime.date>
+    """
+    if isinstance(value, dt.date):
+        return value
+    return dt.date(*map(int, value.replace("-", "/").split("/")))
+
+
+def to_int(value):
+    """
+    :param value: <str> or <int>
+    :return: <int>, ValueError instead of truncating a <float>
+    """
+    if isinstance(value, float):
+        raise ValueError("float is not int: {}".format(value))
+    return int(value)
+
+
+def infer_type(values):
+    """
+    :param values: [<str>, ], sample of a column
+    :return: int, float, datetime.date or str, the narrowest type all values can be converted to
+    """
+    for column_type, converter in ((int, to_int), (float, float), (dt.date, to_date)):
+        try:
+            for value in values:
+                converter(value)
+        except (ValueError, TypeError):
+            continue
+        return column_type
+    return str
+
+
+def converter_of(column_type):
+    """
+    :param column_type: int, float, str, datetime.date or function f(value)
+    :return: function converting one value to column_type
+    """
+    if column_type is dt.date:
+        return to_date
+    return column_type
+
+
 def time_to_num(time):
     '''
-    :param  time: <str>, format: HHMMSSss
+    :param  time: <str> or <int>, format: HHMMSSss
     :return: num: <int>
     '''
-    time = time.zfill(8)
-    time_list = [int(time[i:i+2]) for i in range(0, 8, 2)]
-    unit_list = ["HH", "MM", "SS", "ss"]
-    hash_map = dict(zip(unit_list, time_list))
-    hash_map["HH"] *= 360000
-    hash_map["MM"] *= 6000
-    hash_map["SS"] *= 100
-    return sum(val for val in hash_map.values())  # num
+    time = int(time)
+    return time // 1000000 * 360000 + time // 10000 % 100 * 6000 + time // 100 % 100 * 100 + time % 100  # num
+
+
+def times_to_nums(times):
+    '''
+    :param times: [<str> or <int>, ], format: HHMMSSss
+    :return: nums: array of <int>, for indicators with numeric_time=True
+    '''
+    return array.array("q", (time // 1000000 * 360000 + time // 10000 % 100 * 6000 + time // 100 % 100 * 100 + time % 100
+                             for time in map(int, times)))
 
 
 def num_to_time(num):
@@ -61,6 +153,23 @@ def num_to_time(num):
     return HH + MM + SS + ss
 
 
+@functools.lru_cache(maxsize=None)
+def _closing_date(weekday, n, year, month):
+    """
+    :param weekday: <int> 0 for sunday, ..., 6 for saturday
+    :param       n: <int> n-th weekday of a month
+    :param    year: <int>
+    :param   month: <int>
+    :return: <date> closing date of the month, None if the month is without the n-th weekday
+    """
+    delta = weekday - dt.date(year, month, 1).isoweekday()
+    delta_adj = delta + 7 if delta < 0 else delta
+    try:
+        return dt.date(year, month, 1 + (n - 1) * 7 + delta_adj)
+    except ValueError:  # e.g. 5th friday
+        return None
+
+
 class ClosingDates:
     def __init__(self, date, weekday, n):
         self.__date = date
@@ -74,12 +183,11 @@ class ClosingDates:
         self.__closing_date["n"] = int(num)
 
     def __convert_to_closing_date(self):
-        first_day_of_month = self.__date.replace(day=1)
-        weekday_of_first_day = first_day_of_month.isoweekday()
-        delta = self.__closing_date["weekday"] - weekday_of_first_day
-        delta_adj = delta + 7 if delta < 0 else delta
-        day = 1 + (self.__closing_date["n"] - 1) * 7 + delta_adj
-        self.__closing_date["date"] = self.__date.replace(day=day)
+        closing_date = _closing_date(self.__closing_date["weekday"], self.__closing_date["n"],
+                                     self.__date.year, self.__date.month)
+        if closing_date is None:
+            raise ValueError("day is out of range for month")
+        self.__closing_date["date"] = closing_date
 
     def get(self):
         return self.__closing_date["date"]
@@ -88,13 +196,146 @@ class ClosingDates:
         return self.__date == self.get()
 
 
+class SettlementCalendar:
+    __day_abbr = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+    def __init__(self, weekday="wed", n=3, start_year=1998, end_year=None, holidays=()):
+        """
+        closing dates of every month of a year range, calculated once for arrays of dates,
+        years out of the range are added when a date needs them
+
+        :param    weekday: <str> weekday of closing date, e.g. "wed"
+        :param          n: <int> n-th weekday of closing date
+        :param start_year: <int> first year
+        :param   end_year: <int> last year, default to the next year
+        :param   holidays: [<date>, ] a closing date on a holiday or weekend moves to the next trading day
+        """
+        self.__weekday = self.__day_abbr.index(weekday.lower())
+        self.__n = int(n)
+        self.__holidays = frozenset(holidays)
+        self.__start_year = None
+        self.__end_year = None
+        self.__ordinals = array.array("q")
+        self.__months = []
+        self.__by_month = {}
+        self.__closing = frozenset()
+        self.__extend(start_year, dt.date.today().year + 1 if end_year is None else end_year)
+
+    def __shift(self, date):
+        while date in self.__holidays or date.isoweekday() > 5:
+            date += dt.timedelta(days=1)
+        return date
+
+    def __extend(self, start_year, end_year):
+        if self.__start_year is not None:
+            if self.__start_year <= start_year and end_year <= self.__end_year:
+                return
+            start_year = min(start_year, self.__start_year)
+            end_year = max(end_year, self.__end_year)
+
+        self.__start_year, self.__end_year = start_year, end_year
+        # months without the n-th weekday, e.g. 5th friday, are without closing date
+        self.__by_month = {}
+        for year in range(start_year, end_year + 1):
+            for month in range(1, 13):
+                closing_date = _closing_date(self.__weekday, self.__n, year, month)
+                if closing_date is not None:
+                    self.__by_month[(year, month)] = self.__shift(closing_date)
+        self.__months = list(self.__by_month)
+        self.__ordinals = array.array("q", (date.toordinal() for date in self.__by_month.values()))
+        self.__closing = frozenset(self.__ordinals)
+
+    def __covered(self, dates):
+        if dates:
+            years = [date.year for date in dates]
+            # a date after the closing date of december needs the next year
+            self.__extend(min(years), max(years) + 1)
+
+    def get(self, year, month):
+        """
+        :return: <date> closing date of the month
+        """
+        self.__extend(year, year)
+        if (year, month) not in self.__by_month:
+            raise ValueError("no closing date in {}/{}".format(year, month))
+        return self.__by_month[(year, month)]
+
+    def is_closing(self, dates):
+        """
+        :param dates: [<date>, ]
+        :return: [<bool>, ] True for a closing date
+        """
+        self.__covered(dates)
+        closing = self.__closing
+        return [date.toordinal() in closing for date in dates]
+
+    def next_closing(self, dates):
+        """
+        :param dates: [<date>, ]
+        :return: [<date>, ] the first closing date on or after each date
+        """
+        self.__covered(dates)
+        ordinals = self.__ordinals
+        # dates of ticks repeat, each distinct date is searched once
+        found = {}
+        result = []
+        for date in dates:
+            closing = found.get(date)
+            if closing is None:
+                closing = found[date] = dt.date.fromordinal(ordinals[bisect.bisect_left(ordinals, date.toordinal())])
+            result.append(closing)
+        return result
+
+    def contract_month(self, dates):
+        """
+        :param dates: [<date>, ]
+        :return: [<str>, ] "YYYYMM" of the near month contract, the contract expiring on or after each date
+        """
+        self.__covered(dates)
+        months, ordinals = self.__months, self.__ordinals
+        found = {}
+        result = []
+        for date in dates:
+            code = found.get(date)
+            if code is None:
+                code = found[date] = "{:04d}{:02d}".format(*months[bisect.bisect_left(ordinals, date.toordinal())])
+            result.append(code)
+        return result
+
+
 class _TechnicalIndicators(ABC):
-    def __init__(self):
+    def __init__(self, numeric_time=False):
+        """
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums, not parsed again
+        """
         self._time = None
+        self._last_timestamp = None
+        self._numeric_time = numeric_time
+
+    def _to_num(self, time):
+        return time if self._numeric_time else time_to_num(time)
 
     def _is_out_of_order(self, timestamp):
-        if timestamp < self._time:
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
             raise Exception("timestamp is out of order")
+        self._last_timestamp = timestamp
+
+    @staticmethod
+    def __checked(timestamp):
+        pass
+
+    def assume_ordered(self, numeric_time=None):
+        """
+        times are parsed and checked in order once by the caller for many indicators, e.g. IndicatorPipeline,
+        update does not check the order again
+
+        :param numeric_time: <bool> times are given as <int> from time_to_num, None to keep the mode
+        :return: self
+        """
+        if numeric_time is not None:
+            self._numeric_time = numeric_time
+        self._is_out_of_order = self.__checked
+        return self
 
     @abc.abstractmethod
     def update(self, *args):
@@ -106,13 +347,15 @@ class _TechnicalIndicators(ABC):
 
 
 class _Batched(_TechnicalIndicators, ABC):
-    def __init__(self, initial_time, period):
+    def __init__(self, initial_time, period, numeric_time=False):
         """
         :param initial_time: <str>, start time, e.g., "08450000"
         :param period      : <int>, period for updating sequence, e.g., 6000 for 1 minute
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
         """
-        super().__init__()
+        super().__init__(numeric_time)
         self._time = initial_time
+        self._last_timestamp = initial_time
         self._timestamp = initial_time
         self._period = period
 
@@ -133,15 +376,41 @@ class MovingAverage(_Batched):
         _Batched.__init__(self, initial_time, period)
         self.__interval = interval
         # price
-        self.__ma_price_array = []
+        self.__ma_price_array = collections.deque()
+        self.__ma_price_closed = 0
         self.__ma_price_value = None
         # volume
         self.__latest_volume = 0
-        self.__ma_volume_array = []
+        self.__ma_volume_array = collections.deque()
+        self.__ma_volume_closed = 0
         self.__ma_volume_value = None
 
+    def __append(self, price, volume):
+        self.__ma_price_array.append(price)
+        self.__ma_volume_array.append(volume)
+        # the values before the latest one change only when a period rolls, summed again in the same order
+        self.__ma_price_closed = sum(itertools.islice(self.__ma_price_array, len(self.__ma_price_array) - 1))
+        self.__ma_volume_closed = sum(itertools.islice(self.__ma_volume_array, len(self.__ma_volume_array) - 1))
+
+    def __pop_oldest(self):
+        self.__ma_price_array.popleft()
+        self.__ma_volume_array.popleft()
+
+    def __replace_latest(self, price, volume):
+        self.__ma_price_array[-1] = price
+        self.__ma_volume_array[-1] = volume
+
+    def __sum(self, closed, values):
+        # sum of the closed values + the latest value is sum(values) added in the same order
+        if _COMPENSATED_SUM:
+            return sum(values)
+        return closed + values[-1]
+
     def update(self, time, price, volume):
         """
+        O(1) for each tick in a period, the values before the latest one are summed once when a period rolls,
+        same values as summing the whole sequences after each tick
+
         :param time: <datetime.datetime>
         :param price: <float> or <int> time series value
         :param volume: <float> or <int> cumulative value
@@ -152,32 +421,86 @@ class MovingAverage(_Batched):
         # initialized attributes
         if len(self.__ma_price_array) == 0:
             self.__latest_volume = volume
-            self.__ma_volume_array.append(volume - self.__latest_volume)
-            self.__ma_price_array.append(price)
+            self.__append(price, volume - self.__latest_volume)
 
         # throw exception
         self._is_out_of_order(timestamp)
 
         # updating
         if timestamp < self._timestamp + self._period:
-            self.__ma_price_array[-1] = price
-            self.__ma_volume_array[-1] = volume - self.__latest_volume
+            self.__replace_latest(price, volume - self.__latest_volume)
 
         else:
             self._timestamp += self._period
             self.__latest_volume = volume
 
             if len(self.__ma_price_array) == self.__interval:
-                self.__ma_price_array = self.__ma_price_array[1:] + [price]
-                self.__ma_volume_array = self.__ma_volume_array[1:] + [0]
+                self.__pop_oldest()
 
-            else:
-                self.__ma_price_array.append(price)
-                self.__ma_volume_array.append(0)
+            self.__append(price, 0)
 
         self._time = time
-        self.__ma_price_value = float(sum(self.__ma_price_array)) / len(self.__ma_price_array)
-        self.__ma_volume_value = float(sum(self.__ma_volume_array)) / len(self.__ma_volume_array)
+        self.__ma_price_value = float(self.__sum(self.__ma_price_closed, self.__ma_price_array)) / \
+            len(self.__ma_price_array)
+        self.__ma_volume_value = float(self.__sum(self.__ma_volume_closed, self.__ma_volume_array)) / \
+            len(self.__ma_volume_array)
+
+    def compute(self, times, prices, volumes):
+        """
+        moving averages of a whole series in one pass, same values as get() after each update,
+        the sequences are summed by prefix sums of the closing value of each period,
+        the attributes of this object are not updated
+
+        :param times  : [time, ], same type as initial_time
+        :param prices : [<float> or <int>, ] time series values
+        :param volumes: [<float> or <int>, ] cumulative values
+        :return: ([time, ], array of price moving average, array of volume moving average)
+        """
+        if not len(times) == len(prices) == len(volumes):
+            raise Exception("times, prices and volumes are with different lengths")
+
+        # tick index each period opened at, and period index of each tick
+        opened = [0]
+        periods = []
+        last_time = self._time
+        timestamp = self._timestamp
+        for time in times:
+            if time < last_time:
+                raise Exception("timestamp is out of order")
+            if time >= timestamp + self._period:
+                timestamp += self._period
+                opened.append(len(periods))
+            periods.append(len(opened) - 1)
+            last_time = time
+
+        # closing values of each period, the latest one is still open
+        closed = [max(opened[k], opened[k + 1] - 1) for k in range(len(opened) - 1)]
+        closed_prices = [prices[i] for i in closed]
+        closed_volumes = [volumes[i] - volumes[opened[k]] for k, i in enumerate(closed)]
+
+        ma_price = array.array("d")
+        ma_volume = array.array("d")
+        period = None
+        for i, k in enumerate(periods):
+            if k != period:
+                # the closed values of the sequence are summed once for each period, in the order of update
+                period = k
+                first = max(0, k - self.__interval + 1)
+                n = k - first + 1
+                price_window = closed_prices[first:k]
+                volume_window = closed_volumes[first:k]
+                price_closed = sum(price_window)
+                volume_closed = sum(volume_window)
+            price, volume = prices[i], volumes[i] - volumes[opened[k]]
+            if _COMPENSATED_SUM:
+                # the compensation of sum is not kept in its result, the window is summed again without a copy
+                ma_price.append(float(sum(itertools.chain(price_window, (price,)))) / n)
+                ma_volume.append(float(sum(itertools.chain(volume_window, (volume,)))) / n)
+            else:
+                ma_price.append(float(price_closed + price) / n)
+                ma_volume.append(float(volume_closed + volume) / n)
+
+        return list(times), ma_price, ma_volume
 
     def get(self, info):
         """
@@ -296,15 +619,116 @@ class OpenHighLowClose(_Batched, _Continuous):
         time = self._time if self.__ticks else self._timestamp
         return time, self.__open, self.__high, self.__low, self.__close
 
+    def __bar_starts(self, times):
+        """
+        :return: ([tick index each bar starts at, ], [timestamp of each bar, ])
+        """
+        if self.__ticks:
+            starts = list(range(0, len(times), self.__ticks))
+            ends = [min(start + self.__ticks, len(times)) - 1 for start in starts]
+            return starts, [times[end] for end in ends]
+
+        starts = []
+        timestamps = []
+        last_time = self._time
+        timestamp = self._timestamp
+        for i, time in enumerate(times):
+            if time < last_time:
+                raise Exception("timestamp is out of order")
+            if time >= timestamp + self._period:
+                timestamp += self._period
+                starts.append(i)
+                timestamps.append(timestamp)
+            elif i == 0:
+                starts.append(i)
+                timestamps.append(timestamp)
+            last_time = time
+        return starts, timestamps
+
+    def bars(self, times, prices, volumes=None, flush=True):
+        """
+        bars of a whole series at once, grouped by period or by number of ticks as update does,
+        the attributes of this object are not updated
+
+        :param times  : [time, ]
+        :param prices : [<int> or <float>, ]
+        :param volumes: [<int> or <float>, ] quantity of each tick, None for no volume
+        :param flush  : <bool> include the latest bar, which is not completed yet
+        :return: [(timestamp, open, high, low, close, volume), ]
+        """
+        if len(times) != len(prices) or (volumes is not None and len(volumes) != len(times)):
+            raise Exception("times, prices and volumes are with different lengths")
+
+        starts, timestamps = self.__bar_starts(times)
+        ends = starts[1:] + [len(times)]
+        if not flush:
+            starts, ends = starts[:-1], ends[:-1]
+
+        bars = []
+        for start, end, timestamp in zip(starts, ends, timestamps):
+            window = prices[start:end]
+            volume = None if volumes is None else sum(volumes[start:end])
+            bars.append((timestamp, window[0], max(window), min(window), window[-1], volume))
+        return bars
+
+    def iter_bars(self, ticks, flush=True):
+        """
+        bars of a tick stream, each bar is yielded once it is completed,
+        the attributes of this object are not updated
+
+        :param ticks: iterable of (time, price) or (time, price, volume)
+        :param flush: <bool> yield the latest bar at the end of the stream
+        :return: generator of (timestamp, open, high, low, close, volume)
+        """
+        bar = None
+        count = 0
+        last_time = self._time
+        timestamp = None if self.__ticks else self._timestamp
+        for tick in ticks:
+            time, price = tick[0], tick[1]
+            volume = tick[2] if len(tick) > 2 else None
+
+            if last_time is not None and time < last_time:
+                raise Exception("timestamp is out of order")
+
+            if self.__ticks:
+                is_new = count == self.__ticks
+                count = 1 if is_new else count + 1
+            else:
+                is_new = time >= timestamp + self._period
+                if is_new:
+                    timestamp += self._period
+
+            if bar is not None and is_new:
+                yield tuple(bar)
+
+            if bar is None or is_new:
+                bar = [timestamp, price, price, price, price, volume]
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                if volume is not None:
+                    bar[5] = volume if bar[5] is None else bar[5] + volume
+
+            if self.__ticks:
+                bar[0] = time
+            last_time = time
+
+        if flush and bar is not None:
+            yield tuple(bar)
+
 
 class VolumeCount(_Batched):
-    def __init__(self, initial_time, period):
+    def __init__(self, initial_time, period, numeric_time=False):
         """
         estimating the trading volume per period
         :param initial_time: <str> initial time, e.g., "8450000"
         :param period      : <int> period for estimating trading volume
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
         """
-        _Batched.__init__(self, initial_time, period)
+        _Batched.__init__(self, initial_time, period, numeric_time)
+        self._time = self._last_timestamp = self._timestamp = self._to_num(initial_time)
         self.__quantity = None
         self.__last_amount = None
 
@@ -314,7 +738,7 @@ class VolumeCount(_Batched):
         :param amount: <int> current trading volume
         :return: void
         """
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         if self.__quantity is None:
             self.__quantity = 0
@@ -336,16 +760,16 @@ class VolumeCount(_Batched):
         """
         :return: (<str> timestamp, <int> volume in current period)
         """
-        time = num_to_time(self._timestamp)
+        time = self._timestamp if self._numeric_time else num_to_time(self._timestamp)
         return time, self.__quantity
 
 
 class HighLowPrice(_Continuous):
-    def __init__(self):
+    def __init__(self, numeric_time=False):
         """
-        :param: void
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
         """
-        _Continuous.__init__(self)
+        _Continuous.__init__(self, numeric_time)
         self.__high = None
         self.__low = None
 
@@ -365,7 +789,7 @@ class HighLowPrice(_Continuous):
         :param price: <int> or <float> price
         :return: void
         """
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -391,16 +815,16 @@ class HighLowPrice(_Continuous):
 
 
 class AverageVolume(_Continuous):
-    def __init__(self):
+    def __init__(self, numeric_time=False):
         """
-        :param: void
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
         """
-        _Continuous.__init__(self)
+        _Continuous.__init__(self, numeric_time)
         self.__avg_buy = None
         self.__avg_sell = None
 
     def update(self, time, volume, buy_count, sell_count):
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -419,13 +843,14 @@ class AverageVolume(_Continuous):
 
 
 class SimpleSellBuyVolume(_Continuous):
-    def __init__(self):
+    def __init__(self, numeric_time=False):
         """
         current price  --> next price
         sell: next price < current price 內盤
         buy : next price > current price 外盤
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
         """
-        _Continuous.__init__(self)
+        _Continuous.__init__(self, numeric_time)
         self.__last_price = None
         self.__sell = 0
         self.__buy = 0
@@ -446,7 +871,7 @@ class SimpleSellBuyVolume(_Continuous):
         :param volume: <int> or <float> qty
         :return: void
         """
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -473,8 +898,11 @@ class SimpleSellBuyVolume(_Continuous):
 
 
 class SellBuy(_Continuous):
-    def __init__(self):
-        _Continuous.__init__(self)
+    def __init__(self, numeric_time=False):
+        """
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
+        """
+        _Continuous.__init__(self, numeric_time)
         self.__price = None
         self.__value = None
         self.__sell_price_1 = None
@@ -485,7 +913,7 @@ class SellBuy(_Continuous):
         self.__buy_count = 0
 
     def update(self, time, price, up1, down1, volume):
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -533,8 +961,11 @@ class SellBuy(_Continuous):
 
 
 class CommissionInfo(_Continuous):
-    def __init__(self):
-        _Continuous.__init__(self)
+    def __init__(self, numeric_time=False):
+        """
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
+        """
+        _Continuous.__init__(self, numeric_time)
         # sell
         self.__sell_volume_latest = None
         self.__sell_volume = None
@@ -565,7 +996,7 @@ class CommissionInfo(_Continuous):
             self.__buy_volume_latest = float(buy_volume)
 
     def update(self, time, sell_volume, sell_count, buy_volume, buy_count):
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -611,13 +1042,16 @@ class CommissionInfo(_Continuous):
 
 
 class WeightedAveragePrice(_Continuous):
-    def __init__(self):
-        _Continuous.__init__(self)
+    def __init__(self, numeric_time=False):
+        """
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
+        """
+        _Continuous.__init__(self, numeric_time)
         self.__avg_sell_price = None
         self.__avg_buy_price = None
 
     def update(self, time, sell_pairs, buy_pairs):
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
 
         # initialized attributes
         self._initialize_time(time)
@@ -635,8 +1069,11 @@ class WeightedAveragePrice(_Continuous):
 
 
 class InstitutionalPosition(_Continuous):
-    def __init__(self):
-        _Continuous.__init__(self)
+    def __init__(self, numeric_time=False):
+        """
+        :param numeric_time: <bool> times are given as <int> from time_to_num or times_to_nums
+        """
+        _Continuous.__init__(self, numeric_time)
         self.price = 0
         self.last_buy_cnt = 0
         self.last_sell_cnt = 0
@@ -644,7 +1081,7 @@ class InstitutionalPosition(_Continuous):
         self.acc_sell = 0
 
     def update(self, time, price, current_volume, sell_count, buy_count):
-        timestamp = time_to_num(time)
+        timestamp = self._to_num(time)
         self._initialize_time(time)
         if self.last_buy_cnt == 0 and self.last_sell_cnt == 0:
             self.last_buy_cnt = buy_count
@@ -1 +1,115 @@
 # -*- coding: utf-8 -*-
+
+from array import array
+from itertools import accumulate
+import math
+
+
+def rolling_mean(values, window):
+    """
+    :param values: [<float>, ]
+    :param window: <int> number of values, fewer at the beginning
+    :return: array of moving averages
+    """
+    sums = [0.0] + list(accumulate(values))
+    return array("d", ((sums[i + 1] - sums[max(0, i + 1 - window)]) / min(i + 1, window)
+                       for i in range(len(sums) - 1)))
+
+
+def rolling_std(values, window):
+    """
+    :param values: [<float>, ]
+    :param window: <int> number of values, fewer at the beginning
+    :return: array of moving population standard deviations
+    """
+    # shifted by the first value against cancellation, the deviation does not change
+    shift = values[0] if len(values) else 0.0
+    sums = [0.0] + list(accumulate(value - shift for value in values))
+    squares = [0.0] + list(accumulate((value - shift) ** 2 for value in values))
+    result = array("d")
+    for i in range(len(values)):
+        first = max(0, i + 1 - window)
+        n = i + 1 - first
+        mean = (sums[i + 1] - sums[first]) / n
+        variance = (squares[i + 1] - squares[first]) / n - mean * mean
+        result.append(math.sqrt(variance) if variance > 0 else 0.0)
+    return result
+
+
+class Difference:
+    def __init__(self, values):
+        """
+        differencing and spread signals of a whole series at once
+
+        :param values: [<float>, ] e.g. FuturesPrice.basis(weighted_index)
+        """
+        self._values = array("d", values)
+
+    @classmethod
+    def spread(cls, minuend, subtrahend):
+        """
+        :param    minuend: [<float>, ] e.g. FuturesPrice.next()
+        :param subtrahend: [<float>, ] e.g. FuturesPrice.near()
+        :return: Difference of minuend - subtrahend
+        """
+        if len(minuend) != len(subtrahend):
+            raise Exception("series are with different lengths")
+        return cls(a - b for a, b in zip(minuend, subtrahend))
+
+    def get(self):
+        """
+        :return: array of values
+        """
+        return self._values
+
+    def diff(self, lag=1):
+        """
+        :param lag: <int> days
+        :return: array of value - value lag days before, 0 for the first lag days
+        """
+        values = self._values
+        result = array("d", [0.0] * min(lag, len(values)))
+        result.extend(current - last for current, last in zip(values[lag:], values))
+        return result
+
+    def pct_change(self, lag=1):
+        """
+        :param lag: <int> days
+        :return: array of value / value lag days before - 1, 0 for the first lag days
+        """
+        values = self._values
+        result = array("d", [0.0] * min(lag, len(values)))
+        result.extend(current / last - 1 if last else 0.0 for current, last in zip(values[lag:], values))
+        return result
+
+    def zscore(self, window):
+        """
+        :param window: <int> days of moving average and standard deviation
+        :return: array of (value - moving average) / moving standard deviation, 0 if the deviation is 0
+        """
+        means = rolling_mean(self._values, window)
+        stds = rolling_std(self._values, window)
+        return array("d", ((value - mean) / std if std else 0.0
+                           for value, mean, std in zip(self._values, means, stds)))
+
+    def signal(self, window, entry=2.0, exit=0.5):
+        """
+        mean reversion of the series: short above the band, long below it,
+        the position is kept until the z-score is back within exit
+
+        :param window: <int> days of z-score
+        :param  entry: <float> z-score to open a position
+        :param   exit: <float> z-score to close a position
+        :return: array of positions, 1, 0 or -1
+        """
+        positions = array("q")
+        position = 0
+        for z in self.zscore(window):
+            if z > entry:
+                position = -1
+            elif z < -entry:
+                position = 1
+            elif abs(z) < exit:
+                position = 0
+            positions.append(position)
+        return positions
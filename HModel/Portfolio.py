@@ -1 +1,113 @@
 # -*- coding: utf-8 -*-
+
+from MypseudoSQL import Table
+from array import array
+
+
+def max_drawdown(equity, initial=0.0):
+    """
+    :param  equity: [<float>, ] equity after each day
+    :param initial: <float> equity before the first day
+    :return: <float> largest fall of equity from its previous peak
+    """
+    peak = initial
+    drawdown = 0.0
+    for value in equity:
+        if value > peak:
+            peak = value
+        elif peak - value > drawdown:
+            drawdown = peak - value
+    return drawdown
+
+
+class Portfolio:
+    def __init__(self, prices, dates=None, multiplier=1.0, cost=0.0, initial_cash=0.0):
+        """
+        positions of one futures contract marked to market every day,
+        the whole history is simulated in one pass over arrays
+
+        position: contracts held after the close of the day
+        trade   : position - position of the previous day
+        cost    : |trade| * cost
+        pnl     : position of the previous day * (price - price of the previous day) * multiplier - cost
+        cash    : initial cash + cumulative pnl, futures are settled every day
+
+        :param       prices: [<float>, ] settlement prices, e.g. FuturesPrice.continuous()
+        :param        dates: [<date>, ] dates of the prices, optional
+        :param   multiplier: <float> value of one point of one contract
+        :param         cost: <float> commission and tax of one contract traded
+        :param initial_cash: <float> cash before the first day
+        """
+        if dates is not None and len(dates) != len(prices):
+            raise Exception("dates and prices are with different lengths")
+        self._prices = array("d", prices)
+        self._dates = None if dates is None else list(dates)
+        self._multiplier = multiplier
+        self._cost = cost
+        self._initial_cash = initial_cash
+
+    def __len__(self):
+        return len(self._prices)
+
+    def _simulate(self, positions):
+        """
+        :return: trades, costs, pnls, cash as arrays
+        """
+        if len(positions) != len(self._prices):
+            raise Exception("positions and prices are with different lengths")
+
+        # locals only in the loop, it runs once per day of every evaluated strategy
+        multiplier, unit_cost = self._multiplier, self._cost
+        trades, costs, pnls, cash = array("q"), array("d"), array("d"), array("d")
+        balance = self._initial_cash
+        last_position = 0
+        last_price = self._prices[0] if self._prices else 0.0
+        for position, price in zip(positions, self._prices):
+            trade = position - last_position
+            cost = abs(trade) * unit_cost
+            pnl = last_position * (price - last_price) * multiplier - cost
+            balance += pnl
+            trades.append(trade)
+            costs.append(cost)
+            pnls.append(pnl)
+            cash.append(balance)
+            last_position, last_price = position, price
+        return trades, costs, pnls, cash
+
+    def evaluate(self, positions):
+        """
+        :param positions: [<int>, ] contracts held after each day, e.g. Difference.signal(...)
+        :return: ColumnarTable of (Date,) Price, Position, Trade, Cost, PnL, Cash
+        """
+        trades, costs, pnls, cash = self._simulate(positions)
+        # copies, changing the result does not change the prices of other evaluations
+        data = {"Price": self._prices[:], "Position": array("q", positions), "Trade": trades,
+                "Cost": costs, "PnL": pnls, "Cash": cash}
+        columns = ["Price", "Position", "Trade", "Cost", "PnL", "Cash"]
+        if self._dates is not None:
+            data["Date"] = list(self._dates)
+            columns = ["Date"] + columns
+        return Table.from_columns(data, columns)
+
+    def summary(self, positions):
+        """
+        :param positions: [<int>, ] contracts held after each day
+        :return: [<float> final cash, <float> max drawdown, <int> traded contracts, <float> total cost]
+        """
+        trades, costs, pnls, cash = self._simulate(positions)
+        return [cash[-1] if cash else self._initial_cash,
+                max_drawdown(cash, self._initial_cash),
+                sum(abs(trade) for trade in trades),
+                sum(costs)]
+
+    def evaluate_many(self, strategies):
+        """
+        evaluate many strategies on the same prices, e.g. in a parameter sweep
+
+        :param strategies: {name: [<int> position, ]}
+        :return: ColumnarTable of Strategy, Cash, MaxDrawdown, TradedContract, Cost
+        """
+        rows = [[name] + self.summary(positions) for name, positions in strategies.items()]
+        columns = ["Strategy", "Cash", "MaxDrawdown", "TradedContract", "Cost"]
+        return Table.from_columns(dict(zip(columns, [list(values) for values in zip(*rows)] or [[] for _ in columns])),
+                                  columns)
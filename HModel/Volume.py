@@ -2,45 +2,204 @@
 
 from Futures.Config import Config
 from Futures.DataUtil import DataUtil
+from Futures.Util import SettlementCalendar, to_date
+from HModel.Difference import rolling_mean, rolling_std
+from HModel.Portfolio import max_drawdown
+from MypseudoSQL import Table
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
+import os
+import copy
+import json
 import abc
 from abc import ABC
 
 
 class _VolumeIndicator(ABC):
-    def __init__(self, conf):
+    def __init__(self, conf, data=None):
+        """
+        volume indicator of the whole history, every quantity is calculated for all days at once
+
+        ma                        : average volume of the latest INTERVAL days (fewer at the beginning)
+        volume indicator          : volume / ma - 1, positive if the volume is above its average
+        target                    : 1 contract held if the volume indicator is above THRESHOLD, else 0
+        delta of target           : target - target of the previous day
+        income by volume indicator: target of the previous day * (price - price of the previous day)
+        reserve                   : cumulative income
+        open contract             : contracts held after the day, i.e. target
+        traded contract           : cumulative contracts bought and sold
+
+        :param conf: Config, [VOLUME] INTERVAL, optional THRESHOLD (default 0), FILENAME and PRICE
+        :param data: Table with Date, Volume and price columns, loaded from
+                     BASE_DIR/RESOURCE_DIR/FILENAME of conf if None
+        """
         self._conf = conf
         self._interval = int(conf.prop.get("VOLUME", "INTERVAL"))
-        self._data = None
+        self._threshold = float(conf.prop.get("VOLUME", "THRESHOLD", fallback="0"))
+        self._price_column = conf.prop.get("VOLUME", "PRICE", fallback="CurrentPrice")
+        self._data = data
+        self._ma = None
         self._volume_indicator = None
         self._delta_of_target = None
         self._income_by_volume_indicator = None
         self._reserve = 0
         self._open_contract = 0
         self._traded_contract = 0
+        # series of the whole history
+        self._dates = None
+        self._volume = None
+        self._volume_sums = None
+        self._price = None
+        self._target = None
+        self._reserves = None
+        self._open_contracts = None
+        self._traded_contracts = None
+        # state to advance by new rows
+        self._count = 0
+        self._sums_offset = 0
+        self._last_price = None
+        self._resumed = False
 
     def _load_data(self):
-        pass
+        if self._data is None:
+            filename = os.path.join(self._conf.prop.get("VOLUME", "BASE_DIR"),
+                                    self._conf.prop.get("VOLUME", "RESOURCE_DIR"),
+                                    self._conf.prop.get("VOLUME", "FILENAME",
+                                                        fallback="history_data_for_h_model.csv"))
+            self._data = DataUtil().get_data_from_file(filename, True, columnar=True)
+
+        columns = self._data.to_columns()
+        self._dates = list(columns["Date"])
+        self._volume = array("d", map(float, columns["Volume"]))
+        self._price = array("d", map(float, columns[self._price_column]))
+        # prefix sums of volume do not depend on the interval
+        self._volume_sums = [0.0] + list(accumulate(self._volume))
+        self._count = len(self._volume)
+        self._last_price = self._price[-1] if self._price else None
 
     def _calc_ma(self):
-        pass
+        n = self._interval
+        sums = self._volume_sums
+        self._ma = array("d", ((sums[i + 1] - sums[max(0, i + 1 - n)]) / min(i + 1, n)
+                               for i in range(len(self._volume))))
 
     def _calc_volume_indicator(self):
-        pass
+        self._volume_indicator = array("d", (volume / ma - 1 if ma else 0.0
+                                             for volume, ma in zip(self._volume, self._ma)))
 
     def _calc_delta_of_target(self):
-        pass
+        threshold = self._threshold
+        self._target = array("q", (1 if indicator > threshold else 0 for indicator in self._volume_indicator))
+        previous = [0] + list(self._target[:-1])
+        self._delta_of_target = array("q", (target - last for target, last in zip(self._target, previous)))
 
     def _calc_income_by_volume_indicator(self):
-        pass
+        price = self._price
+        self._income_by_volume_indicator = array("d", [0.0] * min(1, len(price)))
+        self._income_by_volume_indicator.extend(target * (current - last) if target else 0.0
+                                                for target, current, last in zip(self._target, price[1:], price[:-1]))
 
     def _calc_reserve(self):
-        pass
+        self._reserves = array("d", accumulate(self._income_by_volume_indicator))
+        self._reserve = self._reserves[-1] if self._reserves else 0
 
     def _calc_open_contract(self):
-        pass
+        self._open_contracts = self._target
+        self._open_contract = self._open_contracts[-1] if self._open_contracts else 0
 
     def _calc_traded_contract(self):
-        pass
+        self._traded_contracts = array("q", accumulate(abs(delta) for delta in self._delta_of_target))
+        self._traded_contract = self._traded_contracts[-1] if self._traded_contracts else 0
+
+    def _calculate(self):
+        if self._resumed:
+            raise Exception("history is not loaded, only new rows can be appended")
+        self._calc_ma()
+        self._calc_volume_indicator()
+        self._calc_delta_of_target()
+        self._calc_income_by_volume_indicator()
+        self._calc_reserve()
+        self._calc_open_contract()
+        self._calc_traded_contract()
+
+    def _advance(self, dates, volumes, prices):
+        """
+        calculate new rows from the latest state, same values as calculating the whole history again
+
+        :return: void
+        """
+        n = self._interval
+        sums = self._volume_sums
+        for date, volume, price in zip(dates, volumes, prices):
+            i = self._count
+            sums.append(sums[-1] + volume)
+            ma = (sums[i + 1 - self._sums_offset] - sums[max(0, i + 1 - n) - self._sums_offset]) / min(i + 1, n)
+            volume_indicator = volume / ma - 1 if ma else 0.0
+            target = 1 if volume_indicator > self._threshold else 0
+            delta = target - self._open_contract
+            last_target = self._open_contract
+            income = last_target * (price - self._last_price) if i > 0 and last_target else 0.0
+
+            self._reserve += income
+            self._open_contract = target
+            self._traded_contract += abs(delta)
+            self._last_price = price
+            self._count += 1
+
+            self._dates.append(date)
+            self._volume.append(volume)
+            self._price.append(price)
+            self._ma.append(ma)
+            self._volume_indicator.append(volume_indicator)
+            self._target.append(target)
+            self._delta_of_target.append(delta)
+            self._income_by_volume_indicator.append(income)
+            self._reserves.append(self._reserve)
+            self._traded_contracts.append(self._traded_contract)
+
+        # only the latest interval + 1 prefix sums are needed to go on
+        if self._resumed and len(sums) > 2 * (n + 1):
+            self._sums_offset += len(sums) - (n + 1)
+            del sums[:len(sums) - (n + 1)]
+
+    def _state(self):
+        return {"interval": self._interval,
+                "threshold": self._threshold,
+                "price_column": self._price_column,
+                "count": self._count,
+                "volume_sums": self._volume_sums[-(self._interval + 1):],
+                "last_price": self._last_price,
+                "reserve": self._reserve,
+                "open_contract": self._open_contract,
+                "traded_contract": self._traded_contract}
+
+    def _restore(self, state):
+        self._interval = state["interval"]
+        self._threshold = state["threshold"]
+        self._price_column = state["price_column"]
+        self._count = state["count"]
+        self._volume_sums = state["volume_sums"]
+        self._sums_offset = self._count + 1 - len(self._volume_sums)
+        self._last_price = state["last_price"]
+        self._reserve = state["reserve"]
+        self._open_contract = state["open_contract"]
+        self._traded_contract = state["traded_contract"]
+        self._resumed = True
+
+        self._dates = []
+        self._volume, self._price, self._ma = array("d"), array("d"), array("d")
+        self._volume_indicator, self._income_by_volume_indicator = array("d"), array("d")
+        self._target, self._delta_of_target, self._traded_contracts = array("q"), array("q"), array("q")
+        self._reserves = array("d")
+        self._open_contracts = self._target
+
+    def __getstate__(self):
+        # the loaded series are enough to calculate, e.g. in a worker process
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
 
     @abc.abstractmethod
     def get(self):
@@ -51,9 +210,367 @@ class _VolumeIndicator(ABC):
         pass
 
 
-class WeightedIndex:
-    pass
+class VolumeIndicator(_VolumeIndicator):
+    def __init__(self, conf, data=None):
+        _VolumeIndicator.__init__(self, conf, data)
+        self._load_data()
+        self._calculate()
+
+    def get(self):
+        """
+        :return: ColumnarTable of every quantity by date, copies of the series advanced by append
+        """
+        return Table.from_columns({"Date": self._dates[:],
+                                   "Price": self._price[:],
+                                   "Volume": self._volume[:],
+                                   "MA": self._ma[:],
+                                   "VolumeIndicator": self._volume_indicator[:],
+                                   "DeltaOfTarget": self._delta_of_target[:],
+                                   "Income": self._income_by_volume_indicator[:],
+                                   "Reserve": self._reserves[:],
+                                   "OpenContract": self._open_contracts[:],
+                                   "TradedContract": self._traded_contracts[:]})
+
+    def set(self, interval=None, threshold=None):
+        """
+        recalculate with other parameters, the data is not loaded again
+
+        :param  interval: <int> days of moving average
+        :param threshold: <float> volume indicator above which the target is 1 contract
+        :return: void
+        """
+        if interval is not None:
+            self._interval = int(interval)
+        if threshold is not None:
+            self._threshold = float(threshold)
+        self._calculate()
+
+    def append(self, data):
+        """
+        advance by new rows, e.g. a new trading day, in O(new rows)
+
+        :param data: Table with Date, Volume and price columns
+        :return: void
+        """
+        columns = data.to_columns()
+        self._advance(list(columns["Date"]),
+                      array("d", map(float, columns["Volume"])),
+                      array("d", map(float, columns[self._price_column])))
+
+    def checkpoint(self, filename):
+        """
+        write the state needed to append new rows, not the history
+
+        :param filename: <str> path of the checkpoint, json
+        :return: void
+        """
+        with open(filename, "w") as f:
+            json.dump(self._state(), f)
+
+    @classmethod
+    def resume(cls, conf, filename):
+        """
+        :param     conf: Config
+        :param filename: <str> path written by checkpoint
+        :return: VolumeIndicator without history, get() returns the rows appended after resuming
+        """
+        with open(filename) as f:
+            state = json.load(f)
+        indicator = cls.__new__(cls)
+        _VolumeIndicator.__init__(indicator, conf)
+        indicator._restore(state)
+        return indicator
+
+    def _metrics(self):
+        return [self._interval, self._threshold, self._reserve, max_drawdown(self._reserves),
+                self._open_contract, self._traded_contract]
+
+    def sweep(self, intervals, thresholds=None, max_workers=1):
+        """
+        evaluate a grid of parameters on the loaded data,
+        the prefix sums of volume are shared by every interval
+
+        :param   intervals: [<int>, ] days of moving average
+        :param  thresholds: [<float>, ] thresholds of volume indicator, None for the current one
+        :param max_workers: <int> number of processes, 1 to run in this process, None for the number of cores
+        :return: ColumnarTable of Interval, Threshold, Reserve, MaxDrawdown, OpenContract, TradedContract
+        """
+        thresholds = [self._threshold] if thresholds is None else list(thresholds)
+        interval, threshold = self._interval, self._threshold
+
+        if max_workers == 1:
+            rows = [row for i in intervals for row in _sweep_interval(self, i, thresholds)]
+        else:
+            with ProcessPoolExecutor(max_workers, initializer=_set_sweep_indicator, initargs=(self,)) as executor:
+                futures = [executor.submit(_sweep_interval, None, i, thresholds) for i in intervals]
+                rows = [row for future in futures for row in future.result()]
+
+        self.set(interval, threshold)
+        columns = ["Interval", "Threshold", "Reserve", "MaxDrawdown", "OpenContract", "TradedContract"]
+        return Table.from_columns(dict(zip(columns, [list(values) for values in zip(*rows)] or [[] for _ in columns])),
+                                  columns)
+
+
+# indicator of a sweep worker process, sent once by the initializer of the pool
+_sweep_indicator = None
+
+
+def _set_sweep_indicator(indicator):
+    global _sweep_indicator
+    _sweep_indicator = indicator
+
+
+def _sweep_interval(indicator, interval, thresholds):
+    """
+    :return: [[metrics], ] for each threshold, the moving average is calculated once for the interval
+    """
+    indicator = indicator or _sweep_indicator
+    indicator.set(interval, thresholds[0])
+    rows = [indicator._metrics()]
+    for threshold in thresholds[1:]:
+        indicator._threshold = threshold
+        indicator._calc_delta_of_target()
+        indicator._calc_income_by_volume_indicator()
+        indicator._calc_reserve()
+        indicator._calc_open_contract()
+        indicator._calc_traded_contract()
+        rows += [indicator._metrics()]
+    return rows
+
+
+class _Series(ABC):
+    def __init__(self, data, columns):
+        """
+        columns of a daily history in arrays, loaded once,
+        slices by date share the arrays of the whole history
+
+        :param    data: Table with Date and columns, ordered by Date
+        :param columns: ["column", ] columns to load
+        """
+        self._columns = list(columns)
+        self._store = {"Date": [], "columns": dict((column, array("d")) for column in columns)}
+        self._start = 0
+        self._stop = None  # None for the end of the history, also after appending
+        self._load(data)
+
+    def _load(self, data):
+        values = data.to_columns()
+        self._store["Date"].extend(map(to_date, values["Date"]))
+        for column in self._columns:
+            self._store["columns"][column].extend(map(float, values[column]))
+
+    def __len__(self):
+        return self.__stop() - self._start
+
+    def __stop(self):
+        return len(self._store["Date"]) if self._stop is None else self._stop
+
+    def _range(self):
+        return self._start, self.__stop()
+
+    def dates(self):
+        """
+        :return: [<datetime.date>, ]
+        """
+        return self._store["Date"][self._start:self.__stop()]
+
+    def values(self, column):
+        """
+        :param column: <str> column
+        :return: array of values
+        """
+        return self._store["columns"][column][self._start:self.__stop()]
+
+    def between(self, start=None, end=None):
+        """
+        slice by date without copying the data
+
+        :param start: <datetime.date> or <str> e.g. "2018/1/2", inclusive, None for no bound
+        :param   end: <datetime.date> or <str>, inclusive, None for no bound
+        :return: series of the same class
+        """
+        dates = self._store["Date"]
+        first, last = self._range()
+        view = copy.copy(self)
+        view._start = first if start is None else bisect_left(dates, to_date(start), first, last)
+        view._stop = last if end is None else bisect_right(dates, to_date(end), first, last)
+        return view
+
+    def append(self, data):
+        """
+        advance by new rows, e.g. a new trading day, in O(new rows)
+
+        :param data: Table with Date and columns
+        :return: void
+        """
+        if self._stop is not None or self._start != 0:
+            raise Exception("a slice can not be appended")
+        self._load(data)
+
+    def _state(self):
+        return {"columns": self._columns}
+
+    def _restore(self, state):
+        self._columns = state["columns"]
+        self._store = {"Date": [], "columns": dict((column, array("d")) for column in self._columns)}
+        self._start = 0
+        self._stop = None
+
+    def checkpoint(self, filename):
+        """
+        write the state needed to append new rows, not the history
+
+        :param filename: <str> path of the checkpoint, json
+        :return: void
+        """
+        if self._stop is not None or self._start != 0:
+            raise Exception("a slice can not be checkpointed")
+        with open(filename, "w") as f:
+            json.dump(self._state(), f)
+
+    @classmethod
+    def resume(cls, filename):
+        """
+        :param filename: <str> path written by checkpoint
+        :return: series without history, the rows appended after resuming are calculated as if it is loaded
+        """
+        with open(filename) as f:
+            state = json.load(f)
+        series = cls.__new__(cls)
+        series._restore(state)
+        return series
+
+    def returns(self, column):
+        """
+        :param column: <str> column
+        :return: array of value / value of the previous day - 1, 0 at the first day
+        """
+        values = self.values(column)
+        result = array("d", [0.0] * min(1, len(values)))
+        result.extend(current / last - 1 for current, last in zip(values[1:], values[:-1]))
+        return result
+
+    def rolling_mean(self, column, window):
+        """
+        :param column: <str> column
+        :param window: <int> days, fewer at the beginning
+        :return: array of moving averages
+        """
+        return rolling_mean(self.values(column), window)
+
+    def rolling_std(self, column, window):
+        """
+        :param column: <str> column
+        :param window: <int> days, fewer at the beginning
+        :return: array of moving population standard deviations
+        """
+        return rolling_std(self.values(column), window)
+
+
+class WeightedIndex(_Series):
+    def __init__(self, data):
+        """
+        :param data: Table with Date and WeightedIndex, ordered by Date
+        """
+        _Series.__init__(self, data, ["WeightedIndex"])
+
+    def index(self):
+        """
+        :return: array of weighted index
+        """
+        return self.values("WeightedIndex")
+
+
+class FuturesPrice(_Series):
+    def __init__(self, data, weekday="wed", n=3, holidays=()):
+        """
+        near month (CurrentPrice) and next month (NextPrice) futures,
+        the near month rolls to the next month at the n-th weekday of a month, see SettlementCalendar
+
+        :param     data: Table with Date, CurrentPrice and NextPrice, ordered by Date
+        :param  weekday: <str> weekday of closing date, e.g. "wed"
+        :param        n: <int> n-th weekday of closing date
+        :param holidays: [<date>, ] a closing date on a holiday moves to the next trading day
+        """
+        self._weekday = weekday
+        self._n = n
+        self._holidays = list(holidays)
+        self._calendar = SettlementCalendar(weekday, n, holidays=self._holidays)
+        # state of stitching, advanced by appended rows
+        self._adjustment = 0.0
+        self._rolled_month = None
+        _Series.__init__(self, data, ["CurrentPrice", "NextPrice"])
+
+    def _load(self, data):
+        _Series._load(self, data)
+        self.__stitch()
+
+    def _state(self):
+        state = _Series._state(self)
+        state.update({"weekday": self._weekday,
+                      "n": self._n,
+                      "holidays": [holiday.isoformat() for holiday in self._holidays],
+                      "adjustment": self._adjustment,
+                      "rolled_month": self._rolled_month})
+        return state
+
+    def _restore(self, state):
+        _Series._restore(self, state)
+        self._weekday = state["weekday"]
+        self._n = state["n"]
+        self._holidays = [to_date(holiday) for holiday in state["holidays"]]
+        self._calendar = SettlementCalendar(self._weekday, self._n, holidays=self._holidays)
+        self._adjustment = state["adjustment"]
+        self._rolled_month = None if state["rolled_month"] is None else tuple(state["rolled_month"])
+
+    def __stitch(self):
+        """
+        continuous price: near month price plus the sum of spreads (near - next) at every closing date before,
+        only the rows not stitched yet are calculated
+        """
+        dates = self._store["Date"]
+        near = self._store["columns"]["CurrentPrice"]
+        after = self._store["columns"]["NextPrice"]
+        continuous = self._store.setdefault("continuous", array("d"))
+        for i in range(len(continuous), len(dates)):
+            continuous.append(near[i] + self._adjustment)
+
+            # the first trading day on or after the closing date, in case it is a holiday
+            month = (dates[i].year, dates[i].month)
+            if month != self._rolled_month and dates[i] >= self._calendar.get(*month):
+                self._adjustment += near[i] - after[i]
+                self._rolled_month = month
+
+    def near(self):
+        """
+        :return: array of near month price
+        """
+        return self.values("CurrentPrice")
+
+    def next(self):
+        """
+        :return: array of next month price
+        """
+        return self.values("NextPrice")
+
+    def spread(self):
+        """
+        :return: array of next month - near month
+        """
+        return array("d", (after - near for near, after in zip(self.near(), self.next())))
 
+    def basis(self, weighted_index):
+        """
+        :param weighted_index: WeightedIndex of the same dates
+        :return: array of near month - weighted index
+        """
+        if self.dates() != weighted_index.dates():
+            raise Exception("futures price and weighted index are with different dates")
+        return array("d", (near - index for near, index in zip(self.near(), weighted_index.index())))
 
-class FuturesPrice:
-    pass
+    def continuous(self):
+        """
+        :return: array of near month price stitched across closing dates, without the jumps of rolling
+        """
+        start, stop = self._range()
+        return self._store["continuous"][start:stop]
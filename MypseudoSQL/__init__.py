@@ -6,4 +6,5 @@ if major == 2:
     from .pseudoSQL import Table
 
 elif major == 3:
-    from .pseudoSQL3 import Table
+    from .pseudoSQL3 import Table, ColumnarTable, Query
+    from .binary import BinaryWriter, BinaryReader
@@ -0,0 +1,261 @@
+import os
+import sys
+import mmap
+import struct
+import datetime as dt
+from array import array
+from operator import itemgetter
+
+# magic, byte order, number of columns, number of rows, capacity in rows, size of header
+_HEADER = struct.Struct("=4scHQQI")
+_ROWS_OFFSET = 7
+_MAGIC = b"HTCK"
+_BYTEORDER = b"<" if sys.byteorder == "little" else b">"
+_TYPECODES = "bBhHiIqQfd"
+
+
+def _itemsize(dtype):
+    """
+    :param dtype: <str> typecode of array, "date" or "s<N>" for str of N bytes
+    :return: <int> bytes of a value
+    """
+    if dtype in _TYPECODES and len(dtype) == 1:
+        return array(dtype).itemsize
+    if dtype == "date":
+        return 8
+    if dtype.startswith("s") and dtype[1:].isdigit() and int(dtype[1:]) > 0:
+        return int(dtype[1:])
+    raise ValueError("unknown dtype: {}".format(dtype))
+
+
+def infer_dtype(values):
+    """
+    :param values: array, memoryview or [value, ]
+    :return: <str> dtype of the values, see BinaryWriter
+    """
+    if isinstance(values, array):
+        return values.typecode
+    if isinstance(values, memoryview):
+        return values.format
+    if values and all(type(value) is dt.date for value in values):
+        return "date"
+    if values and all(isinstance(value, str) for value in values):
+        return "s{}".format(max(len(value.encode()) for value in values) or 1)
+    if all(type(value) is int for value in values):
+        return "q"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "d"
+    raise TypeError("values can not be stored in fixed width")
+
+
+def _encode(values, dtype):
+    # dates and str of ticks repeat, each distinct value is converted once
+    if dtype == "date":
+        ordinals = {value: value.toordinal() for value in set(values)}
+        return array("q", map(ordinals.__getitem__, values)).tobytes()
+    if dtype.startswith("s"):
+        width = int(dtype[1:])
+        encoded = {value: value.encode() for value in set(values)}
+        if any(len(value) > width for value in encoded.values()):
+            raise ValueError("str is longer than {} bytes".format(width))
+        encoded = {value: content.ljust(width, b"\0") for value, content in encoded.items()}
+        return b"".join(map(encoded.__getitem__, values))
+    if isinstance(values, array) and values.typecode == dtype:
+        return values.tobytes()
+    if isinstance(values, memoryview) and values.format == dtype:
+        return values.tobytes()
+    return array(dtype, values).tobytes()
+
+
+def _read_header(f):
+    magic, byteorder, n, rows, capacity, header_size = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != _MAGIC:
+        raise Exception("not a binary tick file")
+    if byteorder != _BYTEORDER:
+        raise Exception("binary tick file is written in another byte order")
+
+    descriptor = f.read(header_size - _HEADER.size)
+    columns, dtypes = [], []
+    position = 0
+    for _ in range(n):
+        length, = struct.unpack_from("=H", descriptor, position)
+        columns.append(descriptor[position + 2:position + 2 + length].decode())
+        position += 2 + length
+        length = descriptor[position]
+        dtypes.append(descriptor[position + 1:position + 1 + length].decode())
+        position += 1 + length
+    return columns, dtypes, rows, capacity, header_size
+
+
+class BinaryWriter:
+    def __init__(self, filename, columns=None, dtypes=None, buffer_rows=65536):
+        """
+        fixed width binary file of columns: a header with column names and dtypes, then one region
+        per column reserved for capacity rows, the capacity is doubled when an append needs more,
+        so every column stays contiguous for BinaryReader
+
+        :param    filename: <str> path of file, appended if it exists
+        :param     columns: [<str> column, ], optional for an existing file
+        :param      dtypes: [<str> dtype, ], typecode of array in "bBhHiIqQfd", "date" or "s<N>" for str of N bytes
+        :param buffer_rows: <int> rows kept in memory before they are written
+        """
+        self.__buffer_rows = buffer_rows
+        self.__chunks = []
+        self.__rows_buffer = []
+        self.__buffered = 0
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            self.__file = open(filename, "r+b")
+            self.__columns, self.__dtypes, self.__rows, self.__capacity, self.__header_size = _read_header(self.__file)
+            if columns is not None and list(columns) != self.__columns:
+                raise Exception("columns of {} are {}".format(filename, self.__columns))
+            if dtypes is not None and list(dtypes) != self.__dtypes:
+                raise Exception("dtypes of {} are {}".format(filename, self.__dtypes))
+        else:
+            if columns is None or dtypes is None or len(columns) != len(dtypes):
+                raise Exception("columns and dtypes are required for a new file")
+            self.__columns, self.__dtypes = list(columns), list(dtypes)
+            self.__rows, self.__capacity = 0, 0
+            self.__file = open(filename, "w+b")
+            self.__write_header()
+
+        self.__itemsizes = [_itemsize(dtype) for dtype in self.__dtypes]
+
+    def __write_header(self):
+        descriptor = b""
+        for column, dtype in zip(self.__columns, self.__dtypes):
+            name = column.encode()
+            descriptor += struct.pack("=H", len(name)) + name + struct.pack("=B", len(dtype)) + dtype.encode()
+        # regions of columns start at a multiple of 8 bytes
+        self.__header_size = (_HEADER.size + len(descriptor) + 7) // 8 * 8
+        self.__file.seek(0)
+        self.__file.write(_HEADER.pack(_MAGIC, _BYTEORDER, len(self.__columns), self.__rows,
+                                       self.__capacity, self.__header_size))
+        self.__file.write(descriptor.ljust(self.__header_size - _HEADER.size, b"\0"))
+
+    def __offset(self, i, capacity):
+        return self.__header_size + capacity * sum(self.__itemsizes[:i])
+
+    def __grow(self, rows):
+        capacity = max(self.__capacity * 2, (rows + 7) // 8 * 8, 1024)
+        # regions move to higher offsets, the last column is moved first
+        for i in reversed(range(len(self.__columns))):
+            size = self.__rows * self.__itemsizes[i]
+            self.__file.seek(self.__offset(i, self.__capacity))
+            content = self.__file.read(size)
+            self.__file.seek(self.__offset(i, capacity))
+            self.__file.write(content)
+        self.__file.truncate(self.__offset(len(self.__columns), capacity))
+        self.__capacity = capacity
+        self.__file.seek(0)
+        self.__file.write(_HEADER.pack(_MAGIC, _BYTEORDER, len(self.__columns), self.__rows,
+                                       capacity, self.__header_size))
+
+    def write(self, row):
+        """
+        :param row: (values, ) in the order of columns
+        :return: void
+        """
+        if len(row) != len(self.__columns):
+            raise TypeError("wrong number of elements")
+        self.__rows_buffer.append(row)
+        self.__buffered += 1
+        if self.__buffered >= self.__buffer_rows:
+            self.flush()
+
+    def write_columns(self, data):
+        """
+        :param data: {column: values}, arrays with the typecode of the column are written without conversion
+        :return: void
+        """
+        values = [data[column] for column in self.__columns]
+        if len(set(map(len, values))) > 1:
+            raise TypeError("columns are with different lengths")
+        self.__chunk_rows()
+        self.__chunks.append(values)
+        self.__buffered += len(values[0]) if values else 0
+        if self.__buffered >= self.__buffer_rows:
+            self.flush()
+
+    def __chunk_rows(self):
+        if self.__rows_buffer:
+            self.__chunks.append([list(values) for values in zip(*self.__rows_buffer)])
+            self.__rows_buffer = []
+
+    def flush(self):
+        """
+        write the buffered rows, the number of rows in the header is updated after the values
+        """
+        self.__chunk_rows()
+        if not self.__buffered:
+            return
+        rows = self.__rows + self.__buffered
+        if rows > self.__capacity:
+            self.__grow(rows)
+
+        for i, dtype in enumerate(self.__dtypes):
+            self.__file.seek(self.__offset(i, self.__capacity) + self.__rows * self.__itemsizes[i])
+            for chunk in self.__chunks:
+                self.__file.write(_encode(chunk[i], dtype))
+
+        self.__file.seek(_ROWS_OFFSET)
+        self.__file.write(struct.pack("=Q", rows))
+        self.__file.flush()
+        self.__rows = rows
+        self.__chunks = []
+        self.__buffered = 0
+
+    def close(self):
+        self.flush()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BinaryReader:
+    def __init__(self, filename):
+        """
+        memory mapped file of BinaryWriter, numeric columns are memoryviews of the mapped pages
+
+        :param filename: <str> path of file
+        """
+        with open(filename, "rb") as f:
+            self.columns, self.dtypes, self.__rows, capacity, header_size = _read_header(f)
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.__offsets = {}
+        offset = header_size
+        for column, dtype in zip(self.columns, self.dtypes):
+            self.__offsets[column] = offset
+            offset += capacity * _itemsize(dtype)
+
+    def __len__(self):
+        return self.__rows
+
+    def column(self, column):
+        """
+        :param column: <str> column
+        :return: memoryview of a numeric column without copying, [<date>, ] or [<str>, ]
+        """
+        dtype = self.dtypes[self.columns.index(column)]
+        start = self.__offsets[column]
+        view = memoryview(self.__map)[start:start + self.__rows * _itemsize(dtype)]
+        if dtype == "date":
+            ordinals = view.cast("q")
+            dates = {ordinal: dt.date.fromordinal(ordinal) for ordinal in set(ordinals)}
+            return list(map(dates.__getitem__, ordinals))
+        if dtype.startswith("s"):
+            contents = list(map(itemgetter(0), struct.iter_unpack(dtype[1:] + "s", view)))
+            values = {content: content.rstrip(b"\0").decode() for content in set(contents)}
+            return list(map(values.__getitem__, contents))
+        return view.cast(dtype)
+
+    def to_columns(self):
+        """
+        :return: {column: values}, see column
+        """
+        return {column: self.column(column) for column in self.columns}
@@ -1,4 +1,13 @@
+import io
+import os
+import csv
+import gzip
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from itertools import islice
+from .binary import BinaryWriter, BinaryReader, infer_dtype
 
 
 # create a table in SQL
@@ -15,11 +24,135 @@ class Table:
         :param columns: [column_values, ]
         """
         self.columns = columns
+        self._indexes = {}
         self.rows = []
 
     def __repr__(self):
         return str(self.columns) + "\n" + "\n".join(map(str, self.rows))
 
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_columns(cls, data, columns=None, typecodes=None):
+        """CREATE TABLE from column values, stored column by column
+
+        :param data: {column: [values, ]}, every sequence with the same length
+        :param columns: ["column", ], order of columns, default to the order of data
+        :param typecodes: {column: typecode}, array typecode, e.g. "d" or "q", None for a plain list
+        :return: ColumnarTable
+        """
+        if columns is None:
+            columns = list(data.keys())
+
+        lengths = set(len(data[column]) for column in columns)
+        if len(lengths) > 1:
+            raise TypeError("columns with different lengths")
+
+        table = ColumnarTable(columns, typecodes)
+        table._data = {column: _make_column(data[column], table._typecodes.get(column))
+                       for column in columns}
+        return table
+
+    def to_columns(self):
+        """values column by column
+
+        :return: {column: [values, ]}
+        """
+        return {column: [row[column] for row in self.rows] for column in self.columns}
+
+    def _iter_rows(self):
+        return iter(self.rows)
+
+    def _empty(self, columns):
+        return Table(columns)
+
+    def _column_values(self, column):
+        return [row[column] for row in self.rows]
+
+    def query(self):
+        """lazy SELECT, nothing is evaluated until iterated or collected
+
+        table.query().where(...).select([...]).order_by(...).limit(5).collect()
+
+        :return: Query
+        """
+        return Query(self)
+
+    def _take(self, indices):
+        take_table = Table(self.columns)
+        take_table.rows = [self.rows[i] for i in indices]
+        return take_table
+
+    def _rebuild_indexes(self, columns=None):
+        for column, index in self._indexes.items():
+            if columns is None or column in columns:
+                index.build(self._column_values(column))
+
+    def create_index(self, column, kind="hash"):
+        """CREATE INDEX
+
+        create index users_name on users (name);
+
+        the index is maintained by insert, update and delete
+
+        :param column: "column"
+        :param kind: "hash" for where_eq, "sorted" for where_eq and where_between
+        :return: void
+        """
+        if column not in self.columns:
+            raise KeyError("no column: {}".format(column))
+
+        if kind == "hash":
+            index = _HashIndex()
+        elif kind == "sorted":
+            index = _SortedIndex()
+        else:
+            raise ValueError("given kind: hash or sorted. ")
+
+        index.build(self._column_values(column))
+        self._indexes[column] = index
+
+    def drop_index(self, column):
+        """DROP INDEX
+
+        :param column: "column"
+        :return: void
+        """
+        self._indexes.pop(column, None)
+
+    def where_eq(self, column, value):
+        """WHERE column = value
+
+        select * from users where name = "Hero"
+
+        :param column: "column", looked up by its index if any
+        :param value: value
+        :return: table
+        """
+        index = self._indexes.get(column)
+        if index is None:
+            return self.where(lambda row: row[column] == value)
+        return self._take(index.lookup(value))
+
+    def where_between(self, column, low=None, high=None):
+        """WHERE column BETWEEN low AND high
+
+        select * from ticks where time between "09000000" and "13300000"
+
+        rows are ordered by the column if it has a sorted index
+
+        :param column: "column", looked up by its sorted index if any
+        :param low: lower bound, inclusive, None for no bound
+        :param high: upper bound, inclusive, None for no bound
+        :return: table
+        """
+        index = self._indexes.get(column)
+        if not isinstance(index, _SortedIndex):
+            return self.where(lambda row: (low is None or low <= row[column]) and
+                                          (high is None or row[column] <= high))
+        return self._take(index.between(low, high))
+
     def insert(self, row_values):
         """INSERT INTO
 
@@ -33,6 +166,9 @@ class Table:
 
         self.rows += [dict(zip(self.columns, row_values))]
 
+        for column, index in self._indexes.items():
+            index.add(self.rows[-1][column], len(self.rows) - 1)
+
     def update(self, updates, predicate):
         """UPDATE
 
@@ -49,6 +185,8 @@ class Table:
                 for column, new_value in updates.items():
                     row[column] = new_value
 
+        self._rebuild_indexes(updates.keys())
+
     def delete(self, predicate=lambda row: True):
         """DELETE
 
@@ -59,6 +197,7 @@ class Table:
         :return:
         """
         self.rows = [row for row in self.rows if not predicate(row)]
+        self._rebuild_indexes()
 
     def select(self, keep_columns=None, additional_columns=None):
         """SELECT
@@ -77,9 +216,9 @@ class Table:
         if additional_columns is None:
             additional_columns = {}
 
-        result_table = Table(keep_columns + list(additional_columns.keys()))
+        result_table = self._empty(keep_columns + list(additional_columns.keys()))
 
-        for row in self.rows:
+        for row in self._iter_rows():
             new_row = [row[column] for column in keep_columns]
 
             for column_name, calculation in additional_columns.items():
@@ -113,14 +252,31 @@ class Table:
         where_table.rows = list(filter(predicate, self.rows))
         return where_table
 
+    def partition(self, key):
+        """PARTITION BY
+
+        :param key: ["column", ], or function f({key: value}) giving the key of a row
+        :return: {key: table}, keys in order of first row, rows keep their order
+        """
+        if callable(key):
+            keys = map(key, self._iter_rows())
+        else:
+            keys = (tuple(row[column] for column in key) for row in self._iter_rows())
+
+        positions = defaultdict(list)
+        for i, row_key in enumerate(keys):
+            positions[row_key] += [i]
+
+        return dict((row_key, self._take(indices)) for row_key, indices in positions.items())
+
     def group_by(self, group_by_columns, aggregates, having=None):
         grouped_rows = defaultdict(list)
 
-        for row in self.rows:
+        for row in self._iter_rows():
             key = tuple(row[column] for column in group_by_columns)
             grouped_rows[key] += [row]
 
-        result_table = Table(group_by_columns + list(aggregates.keys()))
+        result_table = self._empty(group_by_columns + list(aggregates.keys()))
 
         for key, rows in grouped_rows.items():
             if having is None or having(rows):
@@ -142,51 +298,683 @@ class Table:
         :param order: order condition
         :return: table
         """
-        new_table = self.select()
-        new_table.rows.sort(key=order)
+        new_table = Table(self.columns)
+        new_table.rows = sorted(self.rows, key=order)
         return new_table
 
-    def join(self, other_table, left_join=False):
+    def join(self, other_table, left_join=False, on=None):
         """JOIN
 
         select * from users
         join interests
         on users.user_id =interests.user_id
 
+        rows are matched by a hash index on the join columns of other_table,
+        or merged in one pass if both tables are already ordered by them
+
         :param other_table: the other table with a foreign key (e.g. id)
         :param left_join: boolean
+        :param on: ["column", ], join columns, default to columns in both tables
         :return: table
         """
         # columns in both tables
-        join_on_columns = [col for col in self.columns
-                           if col in other_table.columns]
+        if on is None:
+            on = [col for col in self.columns if col in other_table.columns]
 
         # columns in join table
         additional_columns = [col for col in other_table.columns
-                              if col not in join_on_columns]
+                              if col not in self.columns]
 
-        join_table = Table(self.columns + additional_columns)
+        join_table = self._empty(self.columns + additional_columns)
 
-        for row in self.rows:
-            # check foreign key
-            def is_join(other_row):
-                return all(other_row[col] == row[col] for col in join_on_columns)
+        rows = list(self._iter_rows())
+        other_rows = list(other_table._iter_rows())
+        keys = [_join_key(row, on) for row in rows]
+        other_keys = [_join_key(row, on) for row in other_rows]
 
-            other_rows = other_table.where(is_join).rows
+        matches = None
+        if _is_ordered(keys) and _is_ordered(other_keys):
+            try:
+                matches = _merge_matches(keys, other_keys)
+            except TypeError:  # each side is ordered, but keys of both sides are not comparable, e.g. int and str
+                pass
+        if matches is None:
+            matches = _hash_matches(keys, other_keys)
 
-            for other_row in other_rows:
-                join_table.insert([row[col] for col in self.columns] +
-                                  [other_row[col] for col in additional_columns])
+        for row, matched in zip(rows, matches):
+            values = [row[col] for col in self.columns]
 
-            if left_join and not other_rows:
-                join_table.insert([row[col] for col in self.columns] +
-                                  [None for col in additional_columns])
+            for i in matched:
+                join_table.insert(values + [other_rows[i][col] for col in additional_columns])
+
+            if left_join and not matched:
+                join_table.insert(values + [None for col in additional_columns])
 
         return join_table
 
-    def to_csv(self, dst):
-        with open(dst, "w") as f:
-            f.writelines(",".join(self.columns) + "\n")
-            for row in self.rows:
-                line = ",".join(str(row[col]) for col in self.columns) + "\n"
-                f.writelines(line)
+    def to_csv(self, dst, precision=None, compression=None):
+        """csv file, fields with commas or quotes are quoted, None is written as an empty field
+
+        :param dst: path of file
+        :param precision: <int> digits after the decimal point of float values, None for str(value)
+        :param compression: "gzip", or None to compress only if dst ends with ".gz"
+        :return: void
+        """
+        _write_csv(dst, self.columns, _row_values(self._iter_rows(), self.columns, precision),
+                   compression)
+
+    def to_binary(self, dst, dtypes=None, append=False):
+        """fixed width binary file, see BinaryWriter
+
+        :param dst: path of file
+        :param dtypes: {column: dtype}, inferred from the values if not given, ignored when appending to a file
+        :param append: append the rows if dst exists, else dst is replaced
+        :return: void
+        """
+        data = self.to_columns()
+        if append and os.path.exists(dst) and os.path.getsize(dst) > 0:
+            dtypes = None
+        else:
+            dtypes = dtypes or {}
+            dtypes = [dtypes.get(column) or infer_dtype(data[column]) for column in self.columns]
+            if os.path.exists(dst):
+                os.remove(dst)
+
+        with BinaryWriter(dst, self.columns, dtypes) as writer:
+            writer.write_columns(data)
+
+    @classmethod
+    def from_binary(cls, src):
+        """memory mapped table of a file written by to_binary, numeric columns are not copied
+
+        :param src: path of file
+        :return: ColumnarTable
+        """
+        reader = BinaryReader(src)
+        return cls.from_columns(reader.to_columns(), reader.columns)
+
+
+def _infer_typecode(values):
+    """array typecode fits all values
+
+    :param values: [values, ]
+    :return: "q" for int, "d" for int and float, None for anything else
+    """
+    typecode = None
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        if isinstance(value, float):
+            typecode = "d"
+        elif typecode is None:
+            typecode = "q"
+    return typecode
+
+
+def _make_column(values, typecode=None):
+    """storage of a column, array.array if typed else list
+
+    :param values: [values, ], a typed memoryview (e.g. memory mapped) is kept as it is
+    :param typecode: array typecode, inferred from values if None
+    :return: array, memoryview or list
+    """
+    if isinstance(values, array) and typecode in (None, values.typecode):
+        return values
+
+    if isinstance(values, memoryview) and typecode in (None, values.format):
+        return values
+
+    if not isinstance(values, (list, array)):
+        values = list(values)
+
+    if typecode is None:
+        typecode = _infer_typecode(values)
+        if typecode is None:
+            return values if isinstance(values, list) else list(values)
+        try:
+            return array(typecode, values)
+        except OverflowError:
+            return list(values)
+
+    return array(typecode, values)
+
+
+def _join_key(row, columns):
+    return tuple(row[column] for column in columns)
+
+
+def _is_ordered(keys):
+    try:
+        return all(keys[i] <= keys[i + 1] for i in range(len(keys) - 1))
+    except TypeError:  # e.g. None in keys
+        return False
+
+
+def _hash_matches(keys, other_keys):
+    """indices of other_keys equal to each key, by a hash index on other_keys
+
+    :return: [[index, ], ] in order of keys
+    """
+    index = defaultdict(list)
+    for i, key in enumerate(other_keys):
+        index[key] += [i]
+    return [index.get(key, ()) for key in keys]
+
+
+def _merge_matches(keys, other_keys):
+    """indices of other_keys equal to each key, both keys and other_keys are ordered
+
+    :return: [range(start, stop), ] in order of keys
+    """
+    matches = []
+    start = 0
+    for key in keys:
+        while start < len(other_keys) and other_keys[start] < key:
+            start += 1
+        stop = start
+        while stop < len(other_keys) and other_keys[stop] == key:
+            stop += 1
+        matches += [range(start, stop)]
+    return matches
+
+
+class _HashIndex:
+    """{value: [position, ]}, positions in ascending order"""
+    def __init__(self):
+        self.__positions = defaultdict(list)
+
+    def build(self, values):
+        self.__positions = defaultdict(list)
+        for position, value in enumerate(values):
+            self.__positions[value] += [position]
+
+    def add(self, value, position):
+        self.__positions[value] += [position]
+
+    def lookup(self, value):
+        return self.__positions.get(value, [])
+
+
+class _SortedIndex:
+    """values with their positions, ordered by (value, position)"""
+    def __init__(self):
+        self.__values = []
+        self.__positions = []
+
+    def build(self, values):
+        pairs = sorted(zip(values, range(len(values))))
+        self.__values = [value for value, _ in pairs]
+        self.__positions = [position for _, position in pairs]
+
+    def add(self, value, position):
+        # position is the last one, so it goes after the equal values
+        i = bisect_right(self.__values, value)
+        self.__values.insert(i, value)
+        self.__positions.insert(i, position)
+
+    def lookup(self, value):
+        return self.between(value, value)
+
+    def between(self, low, high):
+        start = 0 if low is None else bisect_left(self.__values, low)
+        stop = len(self.__values) if high is None else bisect_right(self.__values, high)
+        return self.__positions[start:stop]
+
+
+def _take(values, indices):
+    if isinstance(values, array):
+        return array(values.typecode, map(values.__getitem__, indices))
+    if isinstance(values, memoryview):
+        return array(values.format, map(values.__getitem__, indices))
+    return [values[i] for i in indices]
+
+
+class _RowView:
+    """read only {column: value} of one row in a ColumnarTable, no dict is built"""
+    __slots__ = ("_data", "_index")
+
+    def __init__(self, data, index):
+        self._data = data
+        self._index = index
+
+    def __getitem__(self, column):
+        return self._data[column][self._index]
+
+    def __contains__(self, column):
+        return column in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __repr__(self):
+        return str(dict(self.items()))
+
+    def get(self, column, default=None):
+        return self[column] if column in self._data else default
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return [self[column] for column in self._data]
+
+    def items(self):
+        return [(column, self[column]) for column in self._data]
+
+
+class ColumnarTable(Table):
+    def __init__(self, columns, typecodes=None):
+        """CREATE TABLE, stored column by column
+
+        numeric columns are kept in array.array (8 bytes per cell), others in list,
+        rows given to predicates are read only views instead of dicts
+
+        :param columns: [column_values, ]
+        :param typecodes: {column: typecode}, e.g. {"Volume": "q", "WeightedIndex": "d"}
+        """
+        self._typecodes = dict(typecodes) if typecodes else {}
+        self._data = {}
+        Table.__init__(self, columns)
+
+    @property
+    def rows(self):
+        """materialized rows, [{column: value}, ], modifying them does not change the table"""
+        return [dict(zip(self.columns, values)) for values in zip(*self.__column_values())]
+
+    @rows.setter
+    def rows(self, rows):
+        self._data = {column: _make_column([row[column] for row in rows], self._typecodes.get(column))
+                      for column in self.columns}
+        self._rebuild_indexes()
+
+    def __len__(self):
+        return len(self._data[self.columns[0]]) if self.columns else 0
+
+    def __column_values(self):
+        return [self._data[column] for column in self.columns]
+
+    def __writable(self, column):
+        values = self._data[column]
+        if isinstance(values, memoryview):  # read only, e.g. memory mapped, copied on write
+            values = self._data[column] = array(values.format, values)
+        return values
+
+    def __set_value(self, column, index, value):
+        values = self.__writable(column)
+        try:
+            if index is None:
+                values.append(value)
+            else:
+                values[index] = value
+        except (TypeError, OverflowError):
+            if column in self._typecodes:
+                raise
+            if values.typecode == "q" and isinstance(value, float):
+                values = array("d", values)
+            else:
+                values = list(values)
+            self._data[column] = values
+            self.__set_value(column, index, value)
+
+    def to_columns(self):
+        """values column by column, the storage itself is returned without copying
+
+        :return: {column: array, memoryview or list}
+        """
+        return dict((column, self._data[column]) for column in self.columns)
+
+    def _iter_rows(self):
+        return (_RowView(self._data, i) for i in range(len(self)))
+
+    def _empty(self, columns):
+        return ColumnarTable(columns)
+
+    def _column_values(self, column):
+        return self._data[column]
+
+    def _take(self, indices):
+        table = ColumnarTable(self.columns, self._typecodes)
+        table._data = {column: _take(self._data[column], indices) for column in self.columns}
+        return table
+
+    def insert(self, row_values):
+        """INSERT INTO
+
+        :param row_values: [row_values, ]
+        :return: void
+        """
+        if len(row_values) != len(self.columns):
+            raise TypeError("wrong number of elements")
+
+        for column, value in zip(self.columns, row_values):
+            values = self._data[column]
+            if not values and isinstance(values, list) and column not in self._typecodes:
+                self._data[column] = _make_column([value])
+            else:
+                self.__set_value(column, None, value)
+
+        for column, index in self._indexes.items():
+            index.add(self._data[column][-1], len(self) - 1)
+
+    def extend(self, data):
+        """INSERT INTO many rows, column by column, no row is inserted if a column fails
+
+        :param data: {column: [values, ]}, every sequence with the same length
+        :return: void
+        """
+        if set(len(data[column]) for column in self.columns) != {len(data[self.columns[0]])}:
+            raise TypeError("columns with different lengths")
+
+        start = len(self)
+        stored = dict(self._data)
+        try:
+            for column in self.columns:
+                values = self.__writable(column)
+                if not values and isinstance(values, list) and column not in self._typecodes:
+                    self._data[column] = _make_column(data[column])
+                    continue
+                try:
+                    values.extend(data[column])
+                except (TypeError, OverflowError):
+                    if column in self._typecodes:
+                        raise
+                    self._data[column] = _make_column(list(values[:start]) + list(data[column]))
+        except BaseException:
+            # columns extended before the failed one are truncated, the table is left as it was
+            for values in stored.values():
+                if not isinstance(values, memoryview):
+                    del values[start:]
+            self._data = stored
+            raise
+
+        for column, index in self._indexes.items():
+            for position in range(start, len(self)):
+                index.add(self._data[column][position], position)
+
+    def update(self, updates, predicate):
+        """UPDATE
+
+        :param updates: {column: new_value, }
+        :param predicate: boolean function, f({key: value})
+        :return:
+        """
+        for row in self._iter_rows():
+            if predicate(row):
+                for column, new_value in updates.items():
+                    self.__set_value(column, row._index, new_value)
+
+        self._rebuild_indexes(updates.keys())
+
+    def delete(self, predicate=lambda row: True):
+        """DELETE
+
+        :param predicate: boolean function, f({key: value})
+        :return:
+        """
+        self._data = self._take([row._index for row in self._iter_rows() if not predicate(row)])._data
+        self._rebuild_indexes()
+
+    def select(self, keep_columns=None, additional_columns=None):
+        """SELECT
+
+        :param keep_columns: ["column", ]
+        :param additional_columns: {new_col: new_val}
+        :return: table
+        """
+        if keep_columns is None:
+            keep_columns = self.columns
+
+        if additional_columns is None:
+            additional_columns = {}
+
+        data = {column: self._data[column][:] for column in keep_columns}
+        for column_name, calculation in additional_columns.items():
+            data[column_name] = [calculation(row) for row in self._iter_rows()]
+
+        return Table.from_columns(data, keep_columns + list(additional_columns.keys()), self._typecodes)
+
+    def limit(self, lim):
+        """LIMIT
+
+        :param lim: int
+        :return: table
+        """
+        limit_table = ColumnarTable(self.columns, self._typecodes)
+        limit_table._data = {column: self._data[column][:lim] for column in self.columns}
+        return limit_table
+
+    def where(self, predicate=lambda row: True):
+        """WHERE
+
+        :param predicate: boolean function, f({key: value})
+        :return: table
+        """
+        return self._take([row._index for row in self._iter_rows() if predicate(row)])
+
+    def order_by(self, order):
+        """ORDER BY
+
+        :param order: order condition
+        :return: table
+        """
+        return self._take([row._index for row in sorted(self._iter_rows(), key=order)])
+
+    def to_csv(self, dst, precision=None, compression=None):
+        """csv file written column by column, see Table.to_csv
+        """
+        columns = [_format_column(values, precision) for values in self.__column_values()]
+        _write_csv(dst, self.columns, zip(*columns), compression)
+
+
+class Query:
+    def __init__(self, table, columns=None, operations=None):
+        """lazy SELECT over a table
+
+        operations are only recorded, rows flow through where and select one by one,
+        order_by followed by limit keeps the top k rows in a heap
+
+        :param table: Table
+        :param columns: ["column", ], columns of the result
+        :param operations: [(operation, args), ]
+        """
+        self.__table = table
+        self.columns = table.columns if columns is None else columns
+        self.__operations = operations or []
+
+    def __repr__(self):
+        return repr(self.collect())
+
+    def __then(self, operation, args, columns=None):
+        columns = self.columns if columns is None else columns
+        return Query(self.__table, columns, self.__operations + [(operation, args)])
+
+    def where(self, predicate=lambda row: True):
+        """WHERE
+
+        :param predicate: boolean function, f({key: value})
+        :return: query
+        """
+        return self.__then("where", (predicate,))
+
+    def where_eq(self, column, value):
+        """WHERE column = value, looked up by the index of the table if it is the first operation
+
+        :param column: "column"
+        :param value: value
+        :return: query
+        """
+        return self.__then("where_eq", (column, value))
+
+    def where_between(self, column, low=None, high=None):
+        """WHERE column BETWEEN low AND high, looked up by the index of the table if it is the first operation
+
+        :param column: "column"
+        :param low: lower bound, inclusive, None for no bound
+        :param high: upper bound, inclusive, None for no bound
+        :return: query
+        """
+        return self.__then("where_between", (column, low, high))
+
+    def select(self, keep_columns=None, additional_columns=None):
+        """SELECT
+
+        :param keep_columns: ["column", ]
+        :param additional_columns: {new_col: new_val}
+        :return: query
+        """
+        if keep_columns is None:
+            keep_columns = self.columns
+
+        if additional_columns is None:
+            additional_columns = {}
+
+        columns = keep_columns + list(additional_columns.keys())
+        return self.__then("select", (keep_columns, additional_columns), columns)
+
+    def order_by(self, order):
+        """ORDER BY
+
+        :param order: order condition
+        :return: query
+        """
+        return self.__then("order_by", (order,))
+
+    def limit(self, lim):
+        """LIMIT
+
+        :param lim: int
+        :return: query
+        """
+        return self.__then("limit", (lim,))
+
+    def __iter__(self):
+        operations = self.__operations
+        rows = self.__table._iter_rows()
+
+        # the first lookup is answered by the index of the table
+        if operations and operations[0][0] == "where_eq":
+            rows = self.__table.where_eq(*operations[0][1])._iter_rows()
+            operations = operations[1:]
+        elif operations and operations[0][0] == "where_between":
+            rows = self.__table.where_between(*operations[0][1])._iter_rows()
+            operations = operations[1:]
+
+        i = 0
+        while i < len(operations):
+            operation, args = operations[i]
+
+            if operation == "where":
+                rows = filter(args[0], rows)
+
+            elif operation == "where_eq":
+                rows = filter(lambda row, column=args[0], value=args[1]: row[column] == value, rows)
+
+            elif operation == "where_between":
+                rows = filter(lambda row, column=args[0], low=args[1], high=args[2]:
+                              (low is None or low <= row[column]) and (high is None or row[column] <= high), rows)
+
+            elif operation == "select":
+                rows = map(_projection(*args), rows)
+
+            elif operation == "order_by":
+                if i + 1 < len(operations) and operations[i + 1][0] == "limit":  # top k
+                    rows = iter(heapq.nsmallest(operations[i + 1][1][0], rows, key=args[0]))
+                    i += 1
+                else:
+                    rows = iter(sorted(rows, key=args[0]))
+
+            elif operation == "limit":
+                rows = islice(rows, args[0])
+
+            i += 1
+
+        return rows
+
+    def to_csv(self, dst, precision=None, compression=None):
+        """evaluate the query into a csv file, rows are written as they come without a table
+
+        :param dst: path of file
+        :param precision: <int> digits after the decimal point of float values, see Table.to_csv
+        :param compression: "gzip", or None to compress only if dst ends with ".gz"
+        :return: void
+        """
+        _write_csv(dst, self.columns, _row_values(self, self.columns, precision), compression)
+
+    def collect(self):
+        """evaluate the query
+
+        :return: table
+        """
+        table = self.__table._empty(self.columns)
+        for row in self:
+            table.insert([row[column] for column in self.columns])
+        return table
+
+
+def _format_column(values, precision):
+    """
+    :return: iterable of values, float values formatted with precision digits
+    """
+    typecode = getattr(values, "typecode", getattr(values, "format", None))
+    format_float = None if precision is None else "{{:.{}f}}".format(precision).format
+    if typecode is not None:  # array or memoryview
+        return map(format_float, values) if format_float and typecode in ("f", "d") else values
+
+    if values and type(values[0]) not in (str, int, float, bool, type(None)):
+        # e.g. dates of ticks repeat, each distinct value is formatted once
+        try:
+            formatted = {value: "" if value is None else str(value) for value in set(values)}
+        except TypeError:  # unhashable
+            return values
+        return map(formatted.__getitem__, values)
+
+    if format_float is None:
+        return values
+    return (format_float(value) if type(value) is float else value for value in values)
+
+
+def _row_values(rows, columns, precision):
+    """
+    :return: iterable of (values, ) of rows, float values formatted with precision digits
+    """
+    values = (tuple(row[column] for column in columns) for row in rows)
+    if precision is None:
+        return values
+    format_float = "{{:.{}f}}".format(precision).format
+    return (tuple(format_float(value) if type(value) is float else value for value in row) for row in values)
+
+
+def _write_csv(dst, columns, rows, compression=None, buffering=1 << 20):
+    """write rows through a large buffer, rows are consumed lazily
+
+    :param rows: iterable of (values, ) in the order of columns
+    """
+    if compression is None and str(dst).endswith(".gz"):
+        compression = "gzip"
+    if compression == "gzip":
+        # level 6 as gzip(1), 9 is several times slower for a few percent smaller files
+        f = io.TextIOWrapper(io.BufferedWriter(gzip.open(dst, "wb", compresslevel=6), buffering), newline="")
+    elif compression is None:
+        f = open(dst, "w", newline="", buffering=buffering)
+    else:
+        raise ValueError("unknown compression: {}".format(compression))
+
+    with f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def _projection(keep_columns, additional_columns):
+    def project(row):
+        new_row = dict((column, row[column]) for column in keep_columns)
+        for column_name, calculation in additional_columns.items():
+            new_row[column_name] = calculation(row)
+        return new_row
+    return project
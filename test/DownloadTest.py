@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from Futures.DownloadUtil import PriceVolumeDownloader
+import datetime as dt
+import http.server
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+
+MONTH = ('"107年01月市場成交資訊"\n'
+         '"日期","成交股數","成交金額","成交筆數","發行量加權股價指數","漲跌點數",\n'
+         '"107/01/02","3,950,140,279","114,049,471,316","1,057,024","10,710.73","67.85",\n'
+         '"107/01/03","4,478,535,474","128,831,651,669","1,148,034","10,801.57","90.84",\n'
+         '"說明:"\n').encode("cp950")
+
+THROTTLE = b"<html><body>too many requests, please try again later</body></html>"
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """
+    stub of TWSE, the behaviour of a month is set in server.responses:
+    [(<int> status, <bytes> body), ] answered in order, the last one repeated
+    """
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            responses = server.responses.get(self.path, [(200, MONTH)])
+            status, body = responses[min(server.hits[self.path], len(responses)) - 1]
+        time.sleep(0.05)
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class PriceVolumeDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = {}
+        self.server.responses = {}
+        self.server.active = 0
+        self.server.max_active = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def __downloader(self, max_workers=4):
+        base_uri = "http://127.0.0.1:{}/FMTQIK?date={{year}}{{month}}01".format(self.server.server_port)
+        return PriceVolumeDownloader(self.directory.name, base_uri=base_uri, max_workers=max_workers,
+                                     retries=2, backoff=0.01, timeout=5)
+
+    @staticmethod
+    def __path(year, month):
+        return "/FMTQIK?date={}{:02d}01".format(year, month)
+
+    def test_download_concurrently_into_typed_table(self):
+        months = [(2018, month) for month in range(1, 9)]
+        table = self.__downloader().download(months)
+
+        self.assertEqual(len(table), 16)
+        self.assertEqual(table.columns[0], "日期")
+        self.assertEqual(table.rows[0]["日期"], dt.date(2018, 1, 2))
+        self.assertEqual(table.rows[0]["成交股數"], 3950140279.0)
+        self.assertEqual(table.rows[1]["發行量加權股價指數"], 10801.57)
+        self.assertGreater(self.server.max_active, 1)
+        self.assertLessEqual(self.server.max_active, 4)
+
+    def test_cached_months_are_not_downloaded_again(self):
+        months = [(2018, 1), (2018, 2)]
+        self.__downloader().download(months)
+        self.__downloader().download(months)
+
+        self.assertEqual(self.server.hits, {self.__path(*month): 1 for month in months})
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+    def test_retry_server_errors(self):
+        self.server.responses[self.__path(2018, 3)] = [(503, b""), (503, b""), (200, MONTH)]
+        table = self.__downloader().download([(2018, 3)])
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(self.server.hits[self.__path(2018, 3)], 3)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.responses[self.__path(2018, 4)] = [(404, b"")]
+        with self.assertRaises(urllib.error.HTTPError):
+            self.__downloader().download([(2018, 4)])
+        self.assertEqual(self.server.hits[self.__path(2018, 4)], 1)
+
+    def test_unparsable_response_is_not_cached(self):
+        self.server.responses[self.__path(2018, 5)] = [(200, THROTTLE), (200, MONTH)]
+        with self.assertRaises(Exception):
+            self.__downloader().download([(2018, 5)])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+        table = self.__downloader().download([(2018, 5)])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(self.server.hits[self.__path(2018, 5)], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
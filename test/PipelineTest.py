@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from Futures.Pipeline import IndicatorPipeline
+from Futures.Util import HighLowPrice, VolumeCount, time_to_num
+import unittest
+
+
+class IndicatorPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.ticks = [{"time": "09013999", "price": 100, "volume": 10},
+                      {"time": "09014000", "price": 102, "volume": 12},
+                      {"time": "09020000", "price": 99, "volume": 15}]
+
+    def test_indicators_are_switched_to_numeric_time(self):
+        high_low = HighLowPrice()
+        pipeline = IndicatorPipeline().register("hl", high_low, ["price"], outputs=["high", "low"])
+        pipeline.register("volume", VolumeCount("09000000", 6000), ["volume"])
+        result = pipeline.run(self.ticks).to_columns()
+
+        self.assertEqual(result["time"], [tick["time"] for tick in self.ticks])
+        self.assertEqual(list(result["hl_high"]), [100, 102, 102])
+        self.assertEqual(list(result["hl_low"]), [100, 100, 99])
+        self.assertEqual(list(result["volume_0"]), [0, 2, 0])
+        self.assertEqual(high_low.get()[0], time_to_num("09020000"))
+
+    def test_order_is_checked_by_the_pipeline(self):
+        high_low = HighLowPrice()
+        pipeline = IndicatorPipeline().register("hl", high_low, ["price"])
+        with self.assertRaisesRegex(Exception, "out of order"):
+            pipeline.run(self.ticks + [{"time": "09010000", "price": 98}])
+        # the indicator does not check it again
+        high_low.update(time_to_num("09000000"), 97)
+        self.assertEqual(high_low.get()[2], 97)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from Futures.RollupUtil import MinuteRollup
+from Futures.SQLiteUtil import SQLite
+from Futures.Util import time_to_num, num_to_time
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+
+class MinuteRollupTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        random.seed(0)
+        self.ticks = []
+        for date in (20180102, 20180103):
+            timestamp = time_to_num("08450000")
+            for _ in range(5000):
+                timestamp += random.choice([0, 1, 7, 30])
+                self.ticks.append((date, num_to_time(timestamp), 10000 + random.randint(-5, 5), random.randint(1, 5)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def __database(self, name, schema):
+        database = os.path.join(self.directory.name, name)
+        with SQLite(database) as sqlite:
+            sqlite.create_table("tick_log", ["date", "time", "price", "volume"], schema)
+        return database
+
+    @staticmethod
+    def __insert(database, ticks):
+        connection = sqlite3.connect(database)
+        connection.executemany("insert into tick_log values (?, ?, ?, ?)", ticks)
+        connection.commit()
+        connection.close()
+
+    @staticmethod
+    def __bars(database):
+        connection = sqlite3.connect(database)
+        bars = connection.execute("select * from tick_log_minute order by date, time").fetchall()
+        connection.close()
+        return bars
+
+    def __assert_incremental_equals_full(self, schema):
+        full = self.__database("full.db", schema)
+        self.__insert(full, self.ticks)
+        MinuteRollup(full).update()
+
+        incremental = self.__database("incremental.db", schema)
+        rollup = MinuteRollup(incremental)
+        for i in range(0, len(self.ticks), 777):
+            self.__insert(incremental, self.ticks[i:i + 777])
+            rollup.update()
+
+        bars = self.__bars(full)
+        self.assertEqual(bars, self.__bars(incremental))
+        self.assertEqual(sum(bar[-1] for bar in bars), len(self.ticks))
+        self.assertEqual(sum(bar[6] for bar in bars), sum(tick[3] for tick in self.ticks))
+
+    def test_integer_date(self):
+        self.__assert_incremental_equals_full({"date": int, "time": str, "price": float, "volume": int})
+
+    def test_text_columns(self):
+        self.__assert_incremental_equals_full(None)
+        bar = self.__bars(os.path.join(self.directory.name, "full.db"))[0]
+        self.assertIsInstance(bar[2], float)
+        self.assertGreaterEqual(bar[3], bar[4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from Futures.DataUtil import DataUtil
+from Futures.SQLiteUtil import SQLite, SQLitePool
+from Futures.Util import iter_csv, to_date
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+HISTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "test_resources", "history_data_for_h_model.csv")
+
+
+class SQLiteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "history.db")
+
+    def tearDown(self):
+        SQLitePool.of(self.database).close()
+        self.directory.cleanup()
+
+    def __load(self):
+        with SQLite(self.database) as sqlite:
+            return sqlite.write_sqlite(HISTORY, "history")
+
+    def test_write_after_pooled_read(self):
+        rows = self.__load()
+        table = DataUtil().get_data_from_sqlite(self.database, "history", columnar=True)
+        self.assertEqual(len(table), rows)
+
+        self.assertEqual(self.__load(), rows)
+        self.assertEqual(SQLitePool.of(self.database).scan("select count(*) from history"), [(2 * rows,)])
+
+    def test_write_after_pooled_write(self):
+        rows = self.__load()
+        with SQLitePool.of(self.database).writer() as connection:
+            connection.execute("delete from history where Date = ?", ("1998/9/8",))
+
+        self.assertEqual(self.__load(), rows)
+        self.assertEqual(SQLitePool.of(self.database).scan("select count(*) from history"), [(2 * rows - 1,)])
+
+    def test_between_unpadded_dates(self):
+        self.__load()
+        dates = [to_date(row[0]) for row in iter_csv(HISTORY)]
+        expected = [date for date in dates if dt.date(1998, 9, 8) <= date <= dt.date(1998, 12, 31)]
+        self.assertEqual(len(expected), 86)
+
+        data_util = DataUtil()
+        for between in [("Date", "1998/9/8", "1998/12/31"),
+                        ("Date", dt.date(1998, 9, 8), "1998-12-31"),
+                        ("Date", None, dt.date(1998, 12, 31))]:
+            table = data_util.get_data_from_sqlite(self.database, "history", schema={"Date": dt.date},
+                                                   between=between)
+            self.assertEqual(table.to_columns()["Date"], expected)
+
+        chunks = data_util.stream_from_sqlite(self.database, "history", chunksize=50,
+                                              between=("Date", "1998/10/1", None))
+        self.assertEqual(sum(map(len, chunks)), sum(date >= dt.date(1998, 10, 1) for date in dates))
+
+
+if __name__ == "__main__":
+    unittest.main()